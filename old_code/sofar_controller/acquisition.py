@@ -0,0 +1,117 @@
+import datetime
+import queue
+import threading
+import time
+
+import rs485_host
+
+
+class Acquisition:
+    """
+    Polls a device for readings on its own thread, independent of the GUI.
+
+    Every reading is passed to on_sample on the acquisition thread (the csv
+    writer) and put on a bounded queue for the GUI, which drains it at its
+    own frame rate. If the GUI falls so far behind that the queue is full,
+    the oldest reading is dropped and counted, the plot skips it but the
+    csv still has it.
+
+    With a sample_filter (a deadband.Deadband), readings it does not keep
+    go to neither, the filter counts them. on_reading gets every reading,
+    before the filter.
+    """
+
+    def __init__(self, ser, address="02", interval=1.0, queue_size=256, on_sample=None, sample_filter=None,
+                 on_reading=None):
+        self.ser = ser
+        self.address = address
+        self.interval = interval
+        self.queue = queue.Queue(queue_size)
+        self.on_sample = on_sample
+        self.sample_filter = sample_filter
+        self.on_reading = on_reading
+        self.samples = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.late = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            values = rs485_host.read_sensors(self.ser, self.address)
+            now = datetime.datetime.now()
+            if values is None:
+                self.timeouts += 1
+                if self.sample_filter is not None:
+                    self.sample_filter.gap()
+            else:
+                self.samples += 1
+                if self.on_reading is not None:
+                    self.on_reading(now, values)
+                if self.sample_filter is None or self.sample_filter.keep(now.timestamp(), values):
+                    if self.on_sample is not None:
+                        self.on_sample(now, values)
+                    self._put((now, values))
+
+            next_poll += self.interval
+            wait = next_poll - time.monotonic()
+            if wait < 0:
+                # the device was slower than the interval, start counting again from now
+                self.late += 1
+                next_poll = time.monotonic()
+            else:
+                self._stop.wait(wait)
+
+    def drain(self):
+        """Every reading queued since the last drain, oldest first."""
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                return items
+
+
+class RateMeter:
+    """Counts events and reports their rate since the last report."""
+
+    def __init__(self):
+        self.count = 0
+        self._last_count = 0
+        self._last_time = time.monotonic()
+
+    def tick(self, n=1):
+        self.count += n
+
+    def rate(self, count=None):
+        """Rate of tick() calls, or of a counter kept elsewhere, since the last call."""
+        count = self.count if count is None else count
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        rate = (count - self._last_count) / elapsed if elapsed > 0 else 0.0
+        self._last_count = count
+        self._last_time = now
+        return rate
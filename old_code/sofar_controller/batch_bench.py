@@ -0,0 +1,41 @@
+"""
+Measures what batching saves on a real bus.
+
+Runs the same commands once as separate round trips and once as a single
+batched frame, and prints the time per set of commands for each.
+python batch_bench.py [address] [count]
+"""
+import sys
+import time
+
+import rs485_host
+
+COMMANDS = ["read", "version", "device", "sched"]
+
+
+def main():
+    address = sys.argv[1] if len(sys.argv) > 1 else "02"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ser = rs485_host.open_port(timeout=1)
+
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            for command in COMMANDS:
+                rs485_host.query(ser, address, command)
+        separate = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        for _ in range(count):
+            rs485_host.batch(ser, address, COMMANDS)
+        batched = (time.perf_counter() - start) / count
+    finally:
+        ser.close()
+
+    print(f"{len(COMMANDS)} commands, {count} runs")
+    print(f"separate: {separate * 1000:.1f} ms")
+    print(f" batched: {batched * 1000:.1f} ms ({separate / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Baud negotiation demo on a pty.
+
+A simulated device runs the firmware's LineReader, CommandTable and
+BaudNegotiator on one end of a pty and paces what it sends to the current
+baud rate (10 bits per byte), so the transfer time behaves like the real
+link. The host side uses rs485_host on the other end, downloads history
+blocks at the boot rate, negotiates a faster rate and downloads again.
+Also shows the fallback when the device is told to ignore the verify ping.
+PYTHONPATH=libs python baud_bench.py
+"""
+import os
+import threading
+import time
+import tty
+
+import builtins
+builtins.const = lambda x: x
+_t0 = time.monotonic()
+time.ticks_ms = lambda: int((time.monotonic() - _t0) * 1000)
+time.ticks_add = lambda a, b: a + b
+time.ticks_diff = lambda a, b: a - b
+time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+import serial
+
+import rs485_host
+from baudlink import BaudNegotiator
+from dispatch import CommandTable
+from linereader import LineReader
+
+BOOT_BAUD = 115200
+FAST_BAUD = 921600
+VERIFY_MS = 500
+BLOCKS = 20
+# roughly what 'hist 32' sends back
+HIST_REPLY = "1234|" + "|".join(f"{i},{i * 1000},22.10,1015.730,23.80,1015.380" for i in range(32))
+
+
+class PtyUART:
+    def __init__(self, fd):
+        self.fd = fd
+        self.baudrate = BOOT_BAUD
+        self.rx = bytearray()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            data = os.read(self.fd, 1024)
+            with self.lock:
+                self.rx.extend(data)
+
+    def any(self):
+        return len(self.rx)
+
+    def readinto(self, buf):
+        with self.lock:
+            n = min(len(buf), len(self.rx))
+            buf[:n] = self.rx[:n]
+            del self.rx[:n]
+        return n
+
+    def write(self, data):
+        time.sleep(len(data) * 10 / self.baudrate)
+        os.write(self.fd, data)
+
+
+def run_device(fd, ignore_verify):
+    uart = PtyUART(fd)
+    reader = LineReader(uart, idle_ms=1)
+
+    def set_baud(rate):
+        uart.baudrate = rate
+        reader.reset()
+
+    baud = BaudNegotiator(set_baud, BOOT_BAUD, verify_ms=VERIFY_MS)
+    commands = CommandTable("02", uart.write)
+
+    def cmd_baud(args):
+        rate = int(args)
+        baud.request(rate)
+        return f"ack {rate}"
+
+    commands.command("baud", cmd_baud)
+    commands.command("hist", lambda args: HIST_REPLY)
+    commands.static_reply("ping", "pong")
+
+    builtins.print = lambda *args, **kwargs: None # CommandTable logs every frame
+    while True:
+        baud.poll()
+        line = reader.readline()
+        if line is None:
+            continue
+        if ignore_verify and baud.fallback is not None:
+            continue
+        baud.after_frame(commands.dispatch(line))
+
+
+def open_link(ignore_verify=False):
+    master, slave = os.openpty()
+    tty.setraw(master)
+    threading.Thread(target=run_device, args=(master, ignore_verify), daemon=True).start()
+    return serial.Serial(os.ttyname(slave), BOOT_BAUD, timeout=1)
+
+
+def download(ser):
+    start = time.perf_counter()
+    received = 0
+    for _ in range(BLOCKS):
+        received += len(rs485_host.query(ser, "02", "hist 32"))
+    elapsed = time.perf_counter() - start
+    return received / elapsed
+
+
+def main():
+    report = builtins.print
+    ser = open_link()
+    slow = download(ser)
+    ok = rs485_host.negotiate_baud(ser, "02", FAST_BAUD, VERIFY_MS)
+    fast = download(ser)
+    report(f"{BOOT_BAUD} baud: {slow / 1000:.1f} kB/s")
+    report(f"negotiated {FAST_BAUD}: {ok}, {fast / 1000:.1f} kB/s ({fast / slow:.1f}x)")
+
+    ser = open_link(ignore_verify=True)
+    ok = rs485_host.negotiate_baud(ser, "02", FAST_BAUD, VERIFY_MS)
+    report(f"unverified switch kept: {ok}, host back at {ser.baudrate}, ping: {rs485_host.query(ser, '02', 'ping')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Size and decode speed of the delta log against the session csvs.
+
+Encodes every session csv in a directory as a delta log, checks it decodes
+to the same readings, and compares the size with the csv, the csv through
+zlib and the column log, then times decoding the delta logs against
+loading the csvs with csv_loader.
+python codec_bench.py [directory] [--block-rows 4096]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+import csv_loader
+import deltalog
+from columnlog import BLOCK_HEADER_SIZE, FILE_MAGIC, ROW_SIZE
+
+
+def timed(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the delta log with the session csvs")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--block-rows", type=int, default=4096)
+    args = parser.parse_args()
+
+    csv_paths = sorted(glob.glob(os.path.join(args.directory, csv_loader.PATTERN)))
+    with tempfile.TemporaryDirectory() as directory:
+        rows = csv_size = zlib_size = log_size = column_size = 0
+        log_paths = []
+        encode = 0.0
+        for i, csv_path in enumerate(csv_paths):
+            log_path = os.path.join(directory, f"{i}.dlt")
+            start = time.perf_counter()
+            count = deltalog.encode_csv(csv_path, log_path, block_rows=args.block_rows)
+            encode += time.perf_counter() - start
+            log_paths.append(log_path)
+
+            expected = csv_loader.load_csv(csv_path)
+            decoded = deltalog.read_deltalog(log_path)
+            for name in deltalog.COLUMNS:
+                assert np.array_equal(decoded[name], expected[name]), (csv_path, name)
+
+            with open(csv_path, "rb") as f:
+                data = f.read()
+            rows += count
+            csv_size += len(data)
+            zlib_size += len(zlib.compress(data, 9))
+            log_size += os.path.getsize(log_path)
+            blocks = -(-count // args.block_rows)
+            column_size += len(FILE_MAGIC) + blocks * BLOCK_HEADER_SIZE + count * ROW_SIZE
+
+        decode = timed(lambda: [deltalog.read_deltalog(path) for path in log_paths])
+        load = timed(lambda: [csv_loader.load_csv(path) for path in csv_paths])
+
+    print(f"{len(csv_paths)} sessions, {rows} rows, decoded readings match the csvs")
+    print(f"csv        {csv_size:8d} B  {csv_size / rows:5.1f} B/row")
+    print(f"csv zlib 9 {zlib_size:8d} B  {zlib_size / rows:5.1f} B/row  {csv_size / zlib_size:5.1f}x")
+    print(f"column log {column_size:8d} B  {column_size / rows:5.1f} B/row  {csv_size / column_size:5.1f}x")
+    print(f"delta log  {log_size:8d} B  {log_size / rows:5.1f} B/row  {csv_size / log_size:5.1f}x")
+    print(f"encode {encode * 1000:.1f} ms, decode {decode * 1000:.1f} ms ({rows / decode / 1e6:.2f} M rows/s), "
+          f"csv_loader {load * 1000:.1f} ms ({rows / load / 1e6:.2f} M rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import csv
+import os
+import time
+
+import rs485_host
+
+STAGE_FIELDS = ['count', 'mean_us', 'p50_us', 'p90_us', 'p99_us', 'max_us']
+
+
+def parse_stats(reply):
+    """Parse a stats reply into ({stage: {field: value}}, {'free', 'min_free', 'bytes_per_s'}, {counter: value})."""
+    parts = reply.split('|')
+    stages = {}
+    mem = {}
+    counters = {}
+    for part in parts[:-1]:
+        name, values = part.split(':', 1)
+        values = values.split(',')
+        if name == "mem":
+            mem = {'free': int(values[0]), 'min_free': int(values[1]), 'bytes_per_s': float(values[2])}
+        else:
+            stages[name] = dict(zip(STAGE_FIELDS, (int(v) for v in values)))
+    for entry in parts[-1].split(','):
+        if entry:
+            name, value = entry.split('=')
+            counters[name] = int(value)
+    return stages, mem, counters
+
+
+def print_stats(address, stages, mem, counters):
+    print(f"device {address}")
+    print(f"  {'stage':<8}" + "".join(f"{field:>9}" for field in STAGE_FIELDS))
+    for name, stage in stages.items():
+        print(f"  {name:<8}" + "".join(f"{stage[field]:>9}" for field in STAGE_FIELDS))
+    print(f"  mem free {mem.get('free')} min {mem.get('min_free')} trend {mem.get('bytes_per_s')} B/s")
+    print("  " + " ".join(f"{name}={value}" for name, value in counters.items()))
+
+
+def write_rows(csv_filename, address, stages, mem, counters):
+    new_file = not os.path.exists(csv_filename)
+    with open(csv_filename, 'a', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        if new_file:
+            csv_writer.writerow(['Timestamp', 'Device', 'Stage'] + STAGE_FIELDS + ['MemFree', 'MemMin', 'MemTrend', 'Counters'])
+        now = time.time()
+        counter_str = " ".join(f"{name}={value}" for name, value in counters.items())
+        for name, stage in stages.items():
+            csv_writer.writerow([now, address, name] + [stage[field] for field in STAGE_FIELDS]
+                                + [mem.get('free'), mem.get('min_free'), mem.get('bytes_per_s'), counter_str])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect runtime statistics from sofar controllers")
+    parser.add_argument("addresses", nargs="+")
+    parser.add_argument("--interval", type=float, default=0, help="repeat every interval seconds")
+    parser.add_argument("--reset", action="store_true", help="reset the counters after every read")
+    parser.add_argument("--csv", help="append the results to this csv file")
+    parser.add_argument("--baud", type=int, default=115200)
+    args = parser.parse_args()
+
+    ser = rs485_host.open_port(args.baud)
+    try:
+        while True:
+            for address in args.addresses:
+                reply = rs485_host.query(ser, address, "stats reset" if args.reset else "stats")
+                if reply is None or reply == "?":
+                    print(f"device {address}: no reply")
+                    continue
+                stages, mem, counters = parse_stats(reply)
+                print_stats(address, stages, mem, counters)
+                if args.csv:
+                    write_rows(args.csv, address, stages, mem, counters)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    finally:
+        ser.close()
@@ -0,0 +1,166 @@
+"""
+Columnar binary session log, the plotter's replacement for per-row csv.
+
+A log file is a short header followed by blocks. Each block holds up to
+block_rows samples as typed columns: epoch seconds (float64), device
+address (uint8) and the four readings (float32). Blocks are only ever
+appended, so a crash loses at most the rows not flushed yet, and a block
+cut short by one is skipped on reading.
+
+python columnlog.py csv <log> [csv]    export in the plotter's csv format
+python columnlog.py info <log>
+"""
+import argparse
+import csv
+import datetime
+import os
+import struct
+import time
+
+import numpy as np
+
+FILE_MAGIC = b"PLOG\x01\x00\x00\x00"
+BLOCK_HEADER = "<4sI" # magic, rows
+BLOCK_MAGIC = b"COLB"
+BLOCK_HEADER_SIZE = struct.calcsize(BLOCK_HEADER)
+
+COLUMNS = (
+    ("epoch", np.dtype("<f8")),
+    ("device", np.dtype("u1")),
+    ("temperature1", np.dtype("<f4")),
+    ("pressure1", np.dtype("<f4")),
+    ("temperature2", np.dtype("<f4")),
+    ("pressure2", np.dtype("<f4")),
+    )
+ROW_SIZE = sum(dtype.itemsize for name, dtype in COLUMNS)
+
+CSV_COLUMNS = ['Timestamp', 'Temperature1', 'Pressure1', 'Temperature2', 'Pressure2']
+
+
+class ColumnLog:
+    """
+    Writes samples into preallocated column buffers and appends them to the
+    file as one block when block_rows are buffered or flush_interval seconds
+    have passed since the last flush, whichever comes first. on_block is
+    called with the path, offset, length and columns of every block written,
+    the columns are only valid until it returns.
+    """
+
+    def __init__(self, path, block_rows=4096, flush_interval=10.0, on_block=None):
+        self.path = path
+        self.block_rows = block_rows
+        self.flush_interval = flush_interval
+        self.on_block = on_block
+        self.columns = {name: np.empty(block_rows, dtype) for name, dtype in COLUMNS}
+        self.rows = 0
+        self.blocks = 0
+        self.last_flush = time.monotonic()
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(FILE_MAGIC)
+            self.file.flush()
+
+    def append(self, epoch, device, values):
+        """Add one sample, values are (temperature1, pressure1, temperature2, pressure2)."""
+        columns = self.columns
+        row = self.rows
+        columns["epoch"][row] = epoch
+        columns["device"][row] = device
+        columns["temperature1"][row], columns["pressure1"][row], columns["temperature2"][row], columns["pressure2"][row] = values
+        self.rows += 1
+        if self.rows == self.block_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.rows:
+            return
+        offset = self.file.tell()
+        self.file.write(struct.pack(BLOCK_HEADER, BLOCK_MAGIC, self.rows))
+        for name, dtype in COLUMNS:
+            self.file.write(self.columns[name][:self.rows].tobytes())
+        self.file.flush()
+        if self.on_block is not None:
+            columns = {name: column[:self.rows] for name, column in self.columns.items()}
+            self.on_block(self.path, offset, self.file.tell() - offset, columns)
+        self.blocks += 1
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_block(data, offset=0):
+    """(columns, end offset) of the block at offset in data, None at the end or for a torn block."""
+    if offset + BLOCK_HEADER_SIZE > len(data):
+        return None
+    magic, rows = struct.unpack_from(BLOCK_HEADER, data, offset)
+    end = offset + BLOCK_HEADER_SIZE + rows * ROW_SIZE
+    if magic != BLOCK_MAGIC or end > len(data):
+        return None
+    offset += BLOCK_HEADER_SIZE
+    columns = {}
+    for name, dtype in COLUMNS:
+        columns[name] = np.frombuffer(data, dtype, rows, offset)
+        offset += rows * dtype.itemsize
+    return columns, end
+
+
+def read_log(path):
+    """Return {column: array} for every complete block in a log."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(FILE_MAGIC):
+        raise ValueError(f"Not a column log: {path}")
+
+    parts = {name: [] for name, dtype in COLUMNS}
+    offset = len(FILE_MAGIC)
+    while True:
+        block = read_block(data, offset)
+        if block is None:
+            break # the end, or a torn block at the end
+        columns, offset = block
+        for name, column in columns.items():
+            parts[name].append(column)
+    return {name: np.concatenate(arrays) if arrays else np.empty(0, dtype)
+            for (name, arrays), (_, dtype) in zip(parts.items(), COLUMNS)}
+
+
+def export_csv(path, csv_filename):
+    """Write a log out in the csv format data_plotter.py has always written."""
+    columns = read_log(path)
+    with open(csv_filename, 'w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(CSV_COLUMNS)
+        readings = [np.round(columns[name].astype(float), 3) for name in ("temperature1", "pressure1", "temperature2", "pressure2")]
+        for epoch, *values in zip(columns["epoch"], *readings):
+            timestamp = datetime.datetime.fromtimestamp(epoch).strftime("%Y-%m-%d\n%H:%M:%S")
+            csv_writer.writerow([timestamp] + [float(v) for v in values])
+    return len(columns["epoch"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and export column logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("csv", help="export a log to csv")
+    export_parser.add_argument("log")
+    export_parser.add_argument("csv", nargs="?")
+    info_parser = subparsers.add_parser("info", help="summarize a log")
+    info_parser.add_argument("log")
+    args = parser.parse_args()
+
+    if args.command == "csv":
+        csv_filename = args.csv or os.path.splitext(args.log)[0] + ".csv"
+        rows = export_csv(args.log, csv_filename)
+        print(f"wrote {rows} rows to {csv_filename}")
+    else:
+        columns = read_log(args.log)
+        epoch = columns["epoch"]
+        print(f"{len(epoch)} rows, devices {sorted(set(columns['device'].tolist()))}")
+        if len(epoch):
+            start = datetime.datetime.fromtimestamp(epoch[0])
+            end = datetime.datetime.fromtimestamp(epoch[-1])
+            print(f"{start} to {end}")
@@ -0,0 +1,221 @@
+"""
+Bulk loader for the 'pressure data - *.csv' sessions data_plotter.py wrote.
+
+Their timestamps are quoted with a newline inside ("2024-08-29\\n17:35:16"),
+which line based readers trip over and which makes the csv module slow.
+The oldest sessions have plain 2024-08-28 23:04:57 timestamps instead.
+Here the embedded newline is replaced in one regex pass over the file, the
+fixed width timestamps are parsed by numpy as datetime64 and the readings
+as one float array. A directory is loaded with a process pool once there
+is enough to parse to pay for starting it, and every parsed file is cached
+as a .npy record array named after the file's size and mtime, so loading
+the corpus again is one np.load per session.
+
+python csv_loader.py [directory] [--workers N] [--no-cache] [--compare]
+"""
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import glob
+import io
+import os
+import re
+import time
+
+import numpy as np
+
+PATTERN = "pressure data - *.csv"
+CACHE_DIR = ".csv_cache"
+COLUMNS = ("temperature1", "pressure1", "temperature2", "pressure2")
+CACHE_DTYPE = np.dtype([("timestamp", "datetime64[s]")] + [(name, "<f8") for name in COLUMNS])
+POOL_MIN_BYTES = 4 * 1024 * 1024 # less than this parses faster than a pool starts
+
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+_EMBEDDED_NEWLINE = re.compile(rb'(?<=^"\d{4}-\d\d-\d\d)\n', re.MULTILINE)
+_TIMESTAMP_LENGTH = 19 # YYYY-MM-DD HH:MM:SS
+TIMESTAMP_FORMATS = ("%Y-%m-%d\n%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+
+def _empty():
+    columns = {"timestamp": np.empty(0, "datetime64[s]")}
+    columns.update((name, np.empty(0)) for name in COLUMNS)
+    return columns
+
+
+def _parse_slow(data):
+    """The csv module and strptime, for rows the fast path does not understand."""
+    rows = []
+    reader = csv.reader(io.StringIO(data.decode(), newline=''))
+    for row in reader:
+        if len(row) != 5:
+            continue # a row cut short when the plotter was killed
+        for timestamp_format in TIMESTAMP_FORMATS:
+            try:
+                when = datetime.datetime.strptime(row[0], timestamp_format)
+                rows.append((np.datetime64(when, "s"), *(float(v) for v in row[1:])))
+                break
+            except ValueError:
+                pass
+    if not rows:
+        return _empty()
+    columns = list(zip(*rows))
+    result = {"timestamp": np.array(columns[0], "datetime64[s]")}
+    result.update((name, np.array(values)) for name, values in zip(COLUMNS, columns[1:]))
+    return result
+
+
+def _body(data):
+    # everything after the header line
+    return data.partition(b"\n")[2]
+
+
+def _load_slow(path):
+    with open(path, "rb") as f:
+        return _parse_slow(_body(f.read()))
+
+
+def parse_rows(data):
+    """Columns for csv rows as bytes, without the header. Used on whole files and on row groups of one."""
+    # a literal replacement, a template would be expanded once per row
+    lines = _EMBEDDED_NEWLINE.sub(b" ", data).splitlines()
+    if lines and not lines[-1]:
+        lines.pop()
+    if not lines:
+        return _empty()
+
+    # '"YYYY-MM-DD HH:MM:SS",' once the newline is gone, or the same without quotes
+    start = 1 if lines[0].startswith(b'"') else 0
+    end = start + _TIMESTAMP_LENGTH
+    readings_start = end + start + 1
+    try:
+        timestamps = np.array([line[start:end] for line in lines]).astype("datetime64[s]")
+        readings = np.array(b",".join(line[readings_start:] for line in lines).split(b",")).astype(float)
+        if len(readings) != len(lines) * len(COLUMNS):
+            raise ValueError("unexpected number of readings")
+    except ValueError:
+        return _parse_slow(data)
+
+    readings = readings.reshape(len(lines), len(COLUMNS))
+    result = {"timestamp": timestamps}
+    result.update((name, readings[:, i].copy()) for i, name in enumerate(COLUMNS))
+    return result
+
+
+def row_offsets(data):
+    """Offset just past each row of csv rows as bytes, the newlines inside quoted timestamps do not end a row."""
+    newlines = np.flatnonzero(np.frombuffer(data, np.uint8) == ord("\n"))
+    embedded = [match.start() for match in _EMBEDDED_NEWLINE.finditer(data)]
+    ends = np.setdiff1d(newlines, embedded) + 1
+    if data and not data.endswith(b"\n"):
+        ends = np.append(ends, len(data)) # the last row of a file cut short
+    return ends
+
+
+def load_csv(path):
+    """Return {'timestamp': datetime64[s], 'temperature1': float64, ...} for one session file."""
+    with open(path, "rb") as f:
+        return parse_rows(_body(f.read()))
+
+
+def _utc_offset(naive_seconds):
+    return (_NAIVE_EPOCH + datetime.timedelta(seconds=naive_seconds)).timestamp() - naive_seconds
+
+
+def local_epoch(timestamps):
+    """Epoch seconds of the timestamps, which are local time like the plotter writes them."""
+    naive = timestamps.astype("datetime64[s]").astype(np.int64).astype(float)
+    if not len(naive):
+        return naive
+    offset = _utc_offset(naive[0])
+    if offset == _utc_offset(naive[-1]):
+        return naive + offset
+    # a daylight saving change inside the rows
+    return naive + np.array([_utc_offset(seconds) for seconds in naive])
+
+
+def _cache_path(path, stat):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR, f"{name}.{stat.st_size}.{stat.st_mtime_ns}.npy")
+
+
+def _read_cache(path):
+    try:
+        cached = np.load(_cache_path(path, os.stat(path)))
+    except (OSError, ValueError):
+        return None
+    return {name: cached[name] for name in CACHE_DTYPE.names}
+
+
+def _write_cache(path, columns):
+    cache_path = _cache_path(path, os.stat(path))
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    records = np.empty(len(columns["timestamp"]), CACHE_DTYPE)
+    for name in CACHE_DTYPE.names:
+        records[name] = columns[name]
+    # write then rename so a reader never sees half a cache file
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, records)
+    os.replace(temp_path, cache_path)
+    # caches of earlier versions of the file
+    prefix = os.path.join(os.path.dirname(cache_path), glob.escape(os.path.basename(path)))
+    for stale in glob.glob(prefix + ".*.npy"):
+        if stale != cache_path:
+            os.remove(stale)
+
+
+def load_directory(directory=".", pattern=PATTERN, workers=None, cache=True):
+    """Load every session in a directory, returns {path: columns} in file name order. workers=1 never starts a pool."""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    sessions = {}
+    misses = []
+    for path in paths:
+        columns = _read_cache(path) if cache else None
+        if columns is None:
+            misses.append(path)
+        else:
+            sessions[path] = columns
+
+    if len(misses) > 1 and workers != 1 and sum(os.path.getsize(path) for path in misses) >= POOL_MIN_BYTES:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            loaded = list(pool.map(load_csv, misses))
+    else:
+        loaded = [load_csv(path) for path in misses]
+
+    for path, columns in zip(misses, loaded):
+        sessions[path] = columns
+        if cache:
+            _write_cache(path, columns)
+    return {path: sessions[path] for path in paths}
+
+
+def concatenate(sessions):
+    """Join loaded sessions into one set of columns, with a 'session' column of indexes into the sorted paths."""
+    parts = list(sessions.values())
+    if not parts:
+        return dict(_empty(), session=np.empty(0, np.int32))
+    result = {name: np.concatenate([part[name] for part in parts]) for name in ("timestamp",) + COLUMNS}
+    result["session"] = np.concatenate([np.full(len(part["timestamp"]), i, np.int32) for i, part in enumerate(parts)])
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the pressure data csv corpus")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="also time the csv module and strptime")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sessions = load_directory(args.directory, workers=args.workers, cache=not args.no_cache)
+    elapsed = time.perf_counter() - start
+    rows = sum(len(columns["timestamp"]) for columns in sessions.values())
+    print(f"{len(sessions)} sessions, {rows} rows in {elapsed * 1000:.1f} ms")
+
+    if args.compare:
+        start = time.perf_counter()
+        for path in sessions:
+            _load_slow(path)
+        print(f"csv module and strptime: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,24 +1,14 @@
 import serial
 import time
-import csv
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import datetime
-import serial.tools.list_ports
-from matplotlib.ticker import MaxNLocator
-
-def find_ft232r_port():
-
-    for port in serial.tools.list_ports.comports():
-        if port is not None:
-            print(port.description, port.product)
-            if port.product is not None:
-                if "FT232R" in port.product:
-                    return port.device
-                if "FT232R" in port.description:
-                    return port.device
-
-    return None
+from rs485_host import find_ft232r_port
+from liveplot import LivePlot
+from acquisition import Acquisition, RateMeter
+from deadband import Deadband
+from leakrate import LeakMonitor, format_verdict
+from columnlog import ColumnLog, export_csv
+from session_index import SessionIndex
 
 # Find the serial port for FT232R
 serial_port = find_ft232r_port()
@@ -29,19 +19,17 @@ if not serial_port:
 # Set up the serial connection
 ser = serial.Serial(serial_port, 115200, timeout=1)
 
-# Create the CSV file with the current timestamp in the filename
+# Log to a column file with the current timestamp in the filename, the csv is exported from it on exit
 timestamp_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+log_filename = f'pressure data - {timestamp_str}.col'
 csv_filename = f'pressure data - {timestamp_str}.csv'
-csv_file = open(csv_filename, 'a', newline='')
-csv_writer = csv.writer(csv_file)
-csv_writer.writerow(['Timestamp', 'Temperature1', 'Pressure1', 'Temperature2', 'Pressure2'])
+LOG_FLUSH_INTERVAL = 10 # seconds of samples at most lost on a crash
+DEVICE_ADDRESS = "02"
 
-# Initialize lists to store data for plotting
-timestamps = []
-temperature1_data = []
-pressure1_data = []
-temperature2_data = []
-pressure2_data = []
+# Index the sessions recorded before this one, then every block of this one as it is written
+session_index = SessionIndex(".")
+session_index.backfill()
+column_log = ColumnLog(log_filename, flush_interval=LOG_FLUSH_INTERVAL, on_block=session_index.add_block)
 
 # Set up the plot
 plt.style.use('seaborn-darkgrid')
@@ -50,74 +38,75 @@ fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
 # Adjust the layout to reduce wasted space
 plt.tight_layout(pad=4)
 
+# Set DEADBAND to record a reading only when a channel moves more than its deadband, in the
+# order temperature1, pressure1, temperature2, pressure2, or DEADBAND_MAX_INTERVAL seconds
+# have passed. A recorded reading holds until the next one, see deadband.py. None records every reading.
+DEADBAND = None # e.g. (0.1, 0.02, 0.1, 0.02), or (0, 0, 0, 0) for only the changes, losing nothing
+DEADBAND_MAX_INTERVAL = 60
+deadband = Deadband(DEADBAND, DEADBAND_MAX_INTERVAL) if DEADBAND is not None else None
+
+plot = LivePlot(fig, (ax1, ax2), drawstyle="steps-post" if deadband is not None else "default")
+
+
+def record(now, values):
+    # runs on the acquisition thread, the log gets every reading even if the plot drops some
+    temperature1, pressure1, temperature2, pressure2 = values
+    print(f"Temperature1: {temperature1}, Pressure1: {pressure1}, Temperature2: {temperature2}, Pressure2: {pressure2}")
+    column_log.append(now.timestamp(), int(DEVICE_ADDRESS), values)
+
+
+# Leak rate of the inner-outer differential over each window in seconds, judged against LEAK_LIMIT hPa/h
+LEAK_WINDOWS = (600, 3600)
+LEAK_LIMIT = 0.5
+leak_monitor = LeakMonitor(LEAK_WINDOWS, LEAK_LIMIT, on_verdict=lambda *verdict: print(format_verdict(*verdict)))
+
+
+def analyze(now, values):
+    # every reading, also the ones a deadband does not record
+    leak_monitor.add(int(DEVICE_ADDRESS), now.timestamp(), values)
+
+
+# Acquisition polls the device on its own thread at POLL_INTERVAL, the GUI drains it at GUI_FPS
+POLL_INTERVAL = 1.0
+GUI_FPS = 10
+STATS_INTERVAL = 10 # seconds between rate reports on the console
+
+acquisition = Acquisition(ser, DEVICE_ADDRESS, POLL_INTERVAL, on_sample=record, sample_filter=deadband,
+                          on_reading=analyze)
+frames = RateMeter()
+acquired = RateMeter()
+last_stats = time.monotonic()
+
+
+def draw_frame():
+    global last_stats
+    frames.tick()
+    for now, values in acquisition.drain():
+        # Only the new segment is drawn, the cost stays flat however long the test runs
+        plot.add(now, values)
+
+    if time.monotonic() - last_stats >= STATS_INTERVAL:
+        last_stats = time.monotonic()
+        print(f"acquisition {acquired.rate(acquisition.samples):.2f} Hz, gui {frames.rate():.1f} fps, "
+              f"queued {acquisition.queue.qsize()}, dropped {acquisition.dropped}, "
+              f"timeouts {acquisition.timeouts}, late {acquisition.late}"
+              + (f", suppressed {deadband.suppressed}" if deadband is not None else ""))
 
-def animate(i):
-    # Send the command to the serial port
-    ser.write(b"02:00:read\n")
-    time.sleep(1)
-
-    # Read the reply
-    line = ser.readline().decode('utf-8').strip()
-    if line.startswith("00:02:"):
-        data = line[6:].split(',')
-        if len(data) == 4:
-
-            print(f"Temperature1: {float(data[0])}, Pressure1: {float(data[1])}, Temperature2: {float(data[2])}, Pressure2: {float(data[3])}")
-
-
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d\n%H:%M:%S")
-            temperature1 = float(data[0])
-            pressure1 = float(data[1])
-            temperature2 = float(data[2])
-            pressure2 = float(data[3])
-
-            # Append data to CSV
-            csv_writer.writerow([timestamp, temperature1, pressure1, temperature2, pressure2])
-            csv_file.flush()
-
-            # Append data for plotting
-            timestamps.append(timestamp)
-            temperature1_data.append(temperature1)
-            pressure1_data.append(pressure1)
-            temperature2_data.append(temperature2)
-            pressure2_data.append(pressure2)
-
-            # Limit lists to last 50 points for better real-time performance
-            # timestamps[:] = timestamps[-50:]
-            # temperature1_data[:] = temperature1_data[-50:]
-            # pressure1_data[:] = pressure1_data[-50:]
-            # temperature2_data[:] = temperature2_data[-50:]
-            # pressure2_data[:] = pressure2_data[-50:]
-
-            # Plot temperatures
-            ax1.clear()
-            ax1.plot(timestamps, temperature1_data, label='Temperature1', color='blue')
-            ax1.plot(timestamps, temperature2_data, label='Temperature2', color='red')
-            ax1.set_ylim(15, 30)
-            ax1.set_ylabel('Temperature (°C)')
-            ax1.legend(loc='upper left')
-
-            ax1.xaxis.set_major_locator(MaxNLocator(nbins=10))
-            ax1.tick_params(axis='x', rotation=90, labelsize=7)
-
-            # Plot pressures
-            ax2.clear()
-            ax2.plot(timestamps, pressure1_data, label='Pressure1', color='blue')
-            ax2.plot(timestamps, pressure2_data, label='Pressure2', color='red')
-            ax2.set_ylim(400, 1300)
-            ax2.set_ylabel('Pressure (hPa)')
-            ax2.set_xlabel('Time')
-            ax2.legend(loc='upper left')
-            ax2.xaxis.set_major_locator(MaxNLocator(nbins=10))
-
-            ax2.tick_params(axis='x', rotation=90, labelsize=7)
-
-# Set up the animation
-ani = FuncAnimation(fig, animate, interval=1000)
+acquisition.start()
+timer = fig.canvas.new_timer(interval=int(1000 / GUI_FPS))
+timer.add_callback(draw_frame)
+timer.start()
 
 # Show the plot
 plt.show()
 
 # Clean up
+acquisition.stop()
+if deadband is not None:
+    print(deadband.report())
+if int(DEVICE_ADDRESS) in leak_monitor.devices:
+    print("\n".join(leak_monitor.summary(int(DEVICE_ADDRESS))))
 ser.close()
-csv_file.close()
+column_log.close()
+export_csv(log_filename, csv_filename)
+plot.history.close()
@@ -0,0 +1,109 @@
+"""
+Change based recording, for long stretches where the readings hold still.
+
+A reading is kept when any channel has moved more than its deadband from
+the last kept reading, when max_interval seconds have passed since the last
+kept reading, or when it is the first after a missed one. Everything else
+is suppressed.
+
+What the kept readings mean: a kept reading holds until the next kept one,
+but for less than max_interval. Every reading the recorder got in that time
+was within the deadband of it in every channel, so with deadbands of 0 the
+readings are reproduced exactly. reconstruct() does this. No kept reading
+for max_interval or longer means there were no readings, the device timed
+out or the recorder was not running.
+
+python deadband.py [directory] [--deadband T1 P1 T2 P2] [--max-interval S]
+replays the session csvs and reports what would have been kept.
+"""
+import argparse
+
+import numpy as np
+
+import csv_loader
+
+
+class Deadband:
+    """Decides which readings to keep, values are in the order of deadbands."""
+
+    def __init__(self, deadbands, max_interval=60.0):
+        self.deadbands = tuple(deadbands)
+        self.max_interval = max_interval
+        self.held = None
+        self.held_at = None
+        self.seen = 0
+        self.changes = 0
+        self.heartbeats = 0
+        self.resumed = 0
+
+    @property
+    def kept(self):
+        return self.changes + self.heartbeats + self.resumed
+
+    @property
+    def suppressed(self):
+        return self.seen - self.kept
+
+    def keep(self, epoch, values):
+        """True if this reading is to be recorded."""
+        self.seen += 1
+        if self.held is None:
+            self.resumed += 1
+        elif any(abs(value - held) > deadband for value, held, deadband in zip(values, self.held, self.deadbands)):
+            self.changes += 1
+        elif epoch - self.held_at >= self.max_interval:
+            self.heartbeats += 1
+        else:
+            return False
+        self.held = tuple(values)
+        self.held_at = epoch
+        return True
+
+    def gap(self):
+        """A reading was missed, the next one is kept so no hold spans it."""
+        self.held = None
+
+    def report(self):
+        share = self.suppressed / self.seen * 100 if self.seen else 0.0
+        return (f"deadband {self.deadbands}: {self.seen} readings, {self.kept} kept "
+                f"({self.changes} changes, {self.heartbeats} after {self.max_interval:g} s, {self.resumed} first), "
+                f"{self.suppressed} suppressed ({share:.1f}%)")
+
+
+def reconstruct(epoch, values, at, max_interval):
+    """
+    The readings at times at from the kept ones, epoch and values (a row
+    per reading) as recorded. NaN where there was no reading.
+    """
+    values = np.asarray(values, float)
+    at = np.asarray(at, float)
+    if not len(epoch):
+        return np.full((len(at), values.shape[1] if values.ndim == 2 else 0), np.nan)
+    index = np.searchsorted(epoch, at, "right") - 1
+    result = values[np.maximum(index, 0)].copy()
+    missing = (index < 0) | (at - epoch[np.maximum(index, 0)] >= max_interval)
+    result[missing] = np.nan
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the session csvs through a deadband")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--deadband", type=float, nargs=4, default=(0.1, 0.02, 0.1, 0.02))
+    parser.add_argument("--max-interval", type=float, default=60.0)
+    args = parser.parse_args()
+
+    total = Deadband(args.deadband, args.max_interval)
+    worst = np.zeros(len(csv_loader.COLUMNS))
+    for path, columns in csv_loader.load_directory(args.directory).items():
+        epoch = csv_loader.local_epoch(columns["timestamp"])
+        values = np.column_stack([columns[name] for name in csv_loader.COLUMNS])
+        deadband = Deadband(args.deadband, args.max_interval)
+        kept = np.array([deadband.keep(when, row) for when, row in zip(epoch.tolist(), values.tolist())], bool)
+        if len(epoch):
+            error = np.abs(reconstruct(epoch[kept], values[kept], epoch, args.max_interval) - values)
+            worst = np.maximum(worst, error.max(axis=0))
+        for name in ("seen", "changes", "heartbeats", "resumed"):
+            setattr(total, name, getattr(total, name) + getattr(deadband, name))
+    print(total.report())
+    print("largest reconstruction error", dict(zip(csv_loader.COLUMNS, np.round(worst, 6).tolist())))
@@ -0,0 +1,329 @@
+"""
+Delta and run length coded sample log, for readings that mostly sit still.
+
+Readings are stored as fixed point integers, value * scale rounded, with
+the scales in the file header, and timestamps as integer milliseconds. A
+file is the header followed by blocks of up to block_rows samples. A block
+header holds the first sample in full and the block's time range, so every
+block decodes on its own and a reader finds the blocks of a time range from
+the headers alone. The payload holds the difference of each sample from
+the one before, column by column: milliseconds, then each reading. A column
+is stored as runs, (count, difference) for every stretch of the same
+difference, or plainly, one difference per sample, whichever is shorter,
+all as zigzag varints. Timestamps at a regular interval and a reading that
+holds still are then a few bytes for the whole block, and a pressure that
+jitters by 0.01 hPa every sample costs one byte a sample.
+
+Decoding expands the runs with np.repeat and adds them up with cumsum, it
+does no per sample Python.
+
+python deltalog.py encode <csv> [log]
+python deltalog.py info <log>
+"""
+import argparse
+import datetime
+import os
+import struct
+
+import numpy as np
+
+import csv_loader
+
+FILE_MAGIC = b"PDLT"
+VERSION = 1
+COLUMNS = csv_loader.COLUMNS
+SCALES = (10, 100, 10, 100) # the resolution the sensors report: 0.1 °C, 0.01 hPa
+FILE_HEADER = "<4sBB2x" + "I" * len(COLUMNS) # magic, version, columns, scales
+FILE_HEADER_SIZE = struct.calcsize(FILE_HEADER)
+BLOCK_MAGIC = b"DLTB"
+BLOCK_HEADER = "<4sIIqq" + "i" * len(COLUMNS) # magic, rows, payload bytes, first ms, last ms, first readings
+BLOCK_HEADER_SIZE = struct.calcsize(BLOCK_HEADER)
+COLUMN_HEADER = "<BI" # RUNS or PLAIN, bytes
+COLUMN_HEADER_SIZE = struct.calcsize(COLUMN_HEADER)
+RUNS = 0
+PLAIN = 1
+
+
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _encode_varints(values):
+    """values (uint64) as LEB128 varints, seven bits a byte, low bits first."""
+    lengths = np.ones(len(values), np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+    offsets = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), np.uint8)
+    for k in range(int(lengths.max(initial=0))):
+        selected = lengths > k
+        byte = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[selected] + k] = byte | more
+    return out.tobytes()
+
+
+def _decode_varints(data):
+    buf = np.frombuffer(data, np.uint8)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts + 1
+    values = np.zeros(len(ends), np.uint64)
+    for k in range(int(lengths.max(initial=0))):
+        selected = lengths > k
+        values[selected] |= (buf[starts[selected] + k] & np.uint64(0x7f)).astype(np.uint64) << np.uint64(7 * k)
+    return values
+
+
+def quantize(epoch, values, scales=SCALES):
+    """Integer milliseconds and fixed point readings of epoch seconds and rows of readings."""
+    times = np.round(np.asarray(epoch, float) * 1000).astype(np.int64)
+    values = np.round(np.asarray(values, float).reshape(len(times), len(scales)) * scales).astype(np.int64)
+    return times, values
+
+
+def _encode_column(deltas):
+    starts = np.flatnonzero(np.concatenate(([True], deltas[1:] != deltas[:-1])))
+    counts = np.diff(np.append(starts, len(deltas)))
+    runs = _encode_varints(np.column_stack((counts.astype(np.uint64), _zigzag(deltas[starts]))).ravel())
+    plain = _encode_varints(_zigzag(deltas))
+    mode, data = (RUNS, runs) if len(runs) <= len(plain) else (PLAIN, plain)
+    return struct.pack(COLUMN_HEADER, mode, len(data)) + data
+
+
+def _decode_column(mode, data, count):
+    values = _decode_varints(data)
+    if mode == RUNS:
+        runs = values.reshape(-1, 2)
+        deltas = np.repeat(_unzigzag(runs[:, 1]), runs[:, 0].astype(np.int64))
+    elif mode == PLAIN:
+        deltas = _unzigzag(values)
+    else:
+        raise ValueError(f"Unknown column mode {mode}")
+    if len(deltas) != count:
+        raise ValueError("Corrupt column")
+    return deltas
+
+
+def encode_block(times, values):
+    """One block, header and payload, of quantized samples."""
+    rows = np.column_stack((times, values))
+    deltas = np.diff(rows, axis=0)
+    payload = b"".join(_encode_column(column) for column in deltas.T) if len(deltas) else b""
+    header = struct.pack(BLOCK_HEADER, BLOCK_MAGIC, len(rows), len(payload),
+                         int(times[0]), int(times[-1]), *(int(v) for v in values[0]))
+    return header + payload
+
+
+def read_block_header(data, offset=0):
+    """(rows, payload bytes, first ms, last ms, first readings) of the block header at offset, None if there is none."""
+    if offset + BLOCK_HEADER_SIZE > len(data):
+        return None
+    magic, rows, payload_size, first_ms, last_ms, *first = struct.unpack_from(BLOCK_HEADER, data, offset)
+    if magic != BLOCK_MAGIC:
+        return None
+    return rows, payload_size, first_ms, last_ms, first
+
+
+def decode_block(data, offset=0):
+    """(times, values, end offset) of the block at offset, quantized, None at the end or for a torn block."""
+    header = read_block_header(data, offset)
+    if header is None:
+        return None
+    rows, payload_size, first_ms, last_ms, first = header
+    start = offset + BLOCK_HEADER_SIZE
+    end = start + payload_size
+    if end > len(data):
+        return None
+    samples = np.empty((rows, 1 + len(COLUMNS)), np.int64)
+    samples[0] = [first_ms, *first]
+    if rows > 1:
+        position = start
+        for column in range(samples.shape[1]):
+            mode, size = struct.unpack_from(COLUMN_HEADER, data, position)
+            position += COLUMN_HEADER_SIZE
+            samples[1:, column] = _decode_column(mode, data[position:position + size], rows - 1)
+            position += size
+        np.cumsum(samples, axis=0, out=samples)
+    return samples[:, 0], samples[:, 1:], end
+
+
+class DeltaLog:
+    """
+    Writes samples into preallocated buffers and encodes them as one block
+    when block_rows are buffered, or when flush_interval seconds of samples
+    are if that is set, so a crash loses at most that much.
+    """
+
+    def __init__(self, path, scales=SCALES, block_rows=4096, flush_interval=None):
+        self.path = path
+        self.scales = tuple(scales)
+        self.block_rows = block_rows
+        self.flush_interval = flush_interval
+        self.times = np.empty(block_rows, np.int64)
+        self.values = np.empty((block_rows, len(self.scales)), np.int64)
+        self.rows = 0
+        self.blocks = 0
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, "rb") as f:
+                if read_file_header(f.read(FILE_HEADER_SIZE)) != self.scales:
+                    raise ValueError(f"{path} has different scales")
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(struct.pack(FILE_HEADER, FILE_MAGIC, VERSION, len(self.scales), *self.scales))
+            self.file.flush()
+
+    def append(self, epoch, values):
+        """Add one sample, values are (temperature1, pressure1, temperature2, pressure2)."""
+        row = self.rows
+        self.times[row] = round(epoch * 1000)
+        for column, (value, scale) in enumerate(zip(values, self.scales)):
+            self.values[row, column] = round(value * scale)
+        self.rows += 1
+        if (self.rows == self.block_rows or self.flush_interval is not None
+                and self.times[row] - self.times[0] >= self.flush_interval * 1000):
+            self.flush()
+
+    def write(self, epoch, values):
+        """Add many samples at once, epoch is an array and values has a row per sample."""
+        self.flush()
+        times, values = quantize(epoch, values, self.scales)
+        for start in range(0, len(times), self.block_rows):
+            end = start + self.block_rows
+            self.file.write(encode_block(times[start:end], values[start:end]))
+            self.blocks += 1
+        self.file.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.file.write(encode_block(self.times[:self.rows], self.values[:self.rows]))
+        self.file.flush()
+        self.blocks += 1
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_file_header(data):
+    """The scales of a log from its first FILE_HEADER_SIZE bytes."""
+    if len(data) < FILE_HEADER_SIZE:
+        raise ValueError("Not a delta log")
+    magic, version, columns, *scales = struct.unpack_from(FILE_HEADER, data)
+    if magic != FILE_MAGIC or version != VERSION or columns != len(COLUMNS):
+        raise ValueError("Not a delta log")
+    return tuple(scales)
+
+
+def _columns(times, values, scales):
+    result = {"epoch": times / 1000}
+    result.update((name, values[:, i] / scale) for i, (name, scale) in enumerate(zip(COLUMNS, scales)))
+    return result
+
+
+def iter_blocks(path):
+    """Decode a log one block at a time, yields {'epoch', 'temperature1', ...} per block."""
+    with open(path, "rb") as f:
+        scales = read_file_header(f.read(FILE_HEADER_SIZE))
+        while True:
+            header = f.read(BLOCK_HEADER_SIZE)
+            parsed = read_block_header(header)
+            block = decode_block(header + f.read(parsed[1])) if parsed is not None else None
+            if block is None:
+                return # torn block at the end
+            times, values, end = block
+            yield _columns(times, values, scales)
+
+
+def block_table(path):
+    """(offset, end offset, rows, first ms, last ms) of every block, read from the block headers alone."""
+    table = []
+    with open(path, "rb") as f:
+        read_file_header(f.read(FILE_HEADER_SIZE))
+        size = os.fstat(f.fileno()).st_size
+        offset = FILE_HEADER_SIZE
+        while offset + BLOCK_HEADER_SIZE <= size:
+            f.seek(offset)
+            header = read_block_header(f.read(BLOCK_HEADER_SIZE))
+            if header is None:
+                break
+            rows, payload_size, first_ms, last_ms, first = header
+            end = offset + BLOCK_HEADER_SIZE + payload_size
+            if end > size:
+                break # torn block at the end
+            table.append((offset, end, rows, first_ms, last_ms))
+            offset = end
+    return table
+
+
+def read_range(path, start, end, table=None):
+    """Samples from start to end epoch seconds inclusive, decoding only the blocks that overlap them."""
+    if table is None:
+        table = block_table(path)
+    start_ms, end_ms = start * 1000, end * 1000
+    parts = []
+    with open(path, "rb") as f:
+        scales = read_file_header(f.read(FILE_HEADER_SIZE))
+        for offset, block_end, rows, first_ms, last_ms in table:
+            if last_ms < start_ms or first_ms > end_ms:
+                continue
+            f.seek(offset)
+            times, values, block_end = decode_block(f.read(block_end - offset))
+            keep = (times >= start_ms) & (times <= end_ms)
+            parts.append((times[keep], values[keep]))
+    if not parts:
+        return _columns(np.empty(0, np.int64), np.empty((0, len(COLUMNS)), np.int64), scales)
+    return _columns(np.concatenate([t for t, v in parts]), np.concatenate([v for t, v in parts]), scales)
+
+
+def read_deltalog(path):
+    """Return {'epoch': float64, 'temperature1': float64, ...} for every complete block in a log."""
+    parts = list(iter_blocks(path))
+    if not parts:
+        with open(path, "rb") as f:
+            scales = read_file_header(f.read(FILE_HEADER_SIZE))
+        return _columns(np.empty(0, np.int64), np.empty((0, len(COLUMNS)), np.int64), scales)
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def encode_csv(csv_filename, path, scales=SCALES, block_rows=4096):
+    """Write a session csv as a delta log, returns the number of samples."""
+    columns = csv_loader.load_csv(csv_filename)
+    epoch = csv_loader.local_epoch(columns["timestamp"])
+    values = np.column_stack([columns[name] for name in COLUMNS])
+    log = DeltaLog(path, scales, block_rows)
+    log.write(epoch, values)
+    log.close()
+    return len(epoch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode and inspect delta logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    encode_parser = subparsers.add_parser("encode", help="encode a session csv")
+    encode_parser.add_argument("csv")
+    encode_parser.add_argument("log", nargs="?")
+    info_parser = subparsers.add_parser("info", help="summarize a log")
+    info_parser.add_argument("log")
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        path = args.log or os.path.splitext(args.csv)[0] + ".dlt"
+        rows = encode_csv(args.csv, path)
+        print(f"wrote {rows} rows to {path}, {os.path.getsize(path)} B from {os.path.getsize(args.csv)} B")
+    else:
+        table = block_table(args.log)
+        rows = sum(block[2] for block in table)
+        print(f"{rows} rows in {len(table)} blocks, {os.path.getsize(args.log)} B")
+        if table:
+            start = datetime.datetime.fromtimestamp(table[0][3] / 1000)
+            end = datetime.datetime.fromtimestamp(table[-1][4] / 1000)
+            print(f"{start} to {end}")
@@ -0,0 +1,112 @@
+"""
+Parse and dispatch micro-benchmark for the RS485 command handling.
+
+Compares the old regex match plus if/elif chain with CommandTable for
+commands at the start and the end of the old chain, and whether the table
+slows down as commands are added. Each time is the best of REPEATS runs.
+On CPython, where re is C code, the table is slower per message than the
+regex chain, the device has its own numbers. Runs on the device, or on a
+PC with libs/ on the path: PYTHONPATH=libs python dispatch_bench.py
+"""
+import re
+import time
+
+try:
+    const
+except NameError:
+    # running on CPython
+    import builtins
+    builtins.const = lambda x: x
+
+from dispatch import CommandTable
+
+try:
+    _now_us = time.ticks_us
+    _diff_us = time.ticks_diff
+except AttributeError:
+    _now_us = lambda: int(time.perf_counter() * 1000000)
+    _diff_us = lambda a, b: a - b
+
+ITERATIONS = 5000
+REPEATS = 5
+DEVICE_ADDRESS = "02"
+
+
+def _discard(data):
+    pass
+
+
+pattern = re.compile(r"(\d\d):(\d\d):(.*)")
+
+
+def legacy_handle(message):
+    # the old listen_for_uart + handle_message path, minus the print
+    match = pattern.match(message)
+    if not match or match.group(1) != DEVICE_ADDRESS:
+        return
+    match = pattern.match(match.group(0))
+    command = match.group(3).strip()
+    if command == "read":
+        reply = "22.1,1015.73,23.8,1015.38"
+    elif command == "open":
+        reply = "opened"
+    elif command == "close":
+        reply = "closed"
+    elif command == "ping":
+        reply = "pong"
+    elif command == "version":
+        reply = "0.1.0"
+    elif command == "device":
+        reply = "hull test sensor"
+    else:
+        reply = "?"
+    _discard(f"00:{DEVICE_ADDRESS}:{reply}\r\n")
+
+
+def make_table(extra_commands=0):
+    table = CommandTable(DEVICE_ADDRESS, _discard)
+    table.command("read", lambda args: "22.1,1015.73,23.8,1015.38")
+    table.command("open", lambda args: "opened")
+    table.command("close", lambda args: "closed")
+    table.static_reply("ping", "pong")
+    table.static_reply("version", "0.1.0")
+    table.static_reply("device", "hull test sensor")
+    for i in range(extra_commands):
+        table.command(f"extra{i}", lambda args: "ok")
+    return table
+
+
+def bench(fn, arg):
+    best = None
+    for _ in range(REPEATS):
+        start = _now_us()
+        for _ in range(ITERATIONS):
+            fn(arg)
+        elapsed = _diff_us(_now_us(), start)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / ITERATIONS
+
+
+def main():
+    import builtins
+    real_print = builtins.print
+    tables = ((6, make_table()), (60, make_table(54)))
+    results = []
+    # CommandTable prints every message like the firmware does, keep it out of the timing
+    builtins.print = _discard
+    try:
+        for command in ("read", "device"):
+            line = f"02:00:{command}"
+            results.append((command, "legacy", bench(legacy_handle, line)))
+            for size, table in tables:
+                results.append((command, f"table[{size}]", bench(table.dispatch, line.encode("ascii"))))
+    finally:
+        builtins.print = real_print
+
+    for command, name, us in results:
+        print(f"{command:>7} {name:>10}: {us:.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
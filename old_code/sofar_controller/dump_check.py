@@ -0,0 +1,89 @@
+"""
+Checks that downloading the flash log does not hold up the sensor jobs.
+
+Writes a full segment, runs the firmware in the sim with it on its flash and
+downloads the segment with flashlog_reader over the sim's pty, which sends
+at the baud rate like the real link, so this takes seconds. The overrun
+counts of the sched command must be the same before and after.
+python dump_check.py
+"""
+import os
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import serial
+
+import flashlog_reader
+import rs485_host
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDRESS = "02"
+# a full segment of libs/flashlog.py, after its boot marker
+SEGMENT_RECORDS = 16 * (4096 // flashlog_reader.RECORD_SIZE)
+SETTLE_S = 2.0
+
+
+def write_segment(path):
+    with open(path, "wb") as f:
+        f.write(struct.pack(flashlog_reader.RECORD_FORMAT, flashlog_reader.BOOT_MARKER, 0, 0, 0, 0, 0))
+        for seq in range(SEGMENT_RECORDS):
+            f.write(struct.pack(flashlog_reader.RECORD_FORMAT, seq, seq * 500, 22.3, 1013.25, 22.5, 1013.4))
+
+
+def start_sim(workdir):
+    sim = subprocess.Popen([sys.executable, "-u", os.path.join(HERE, "sim", "run.py"), os.path.join(HERE, "main.py"),
+                            "--workdir", workdir], stdout=subprocess.PIPE, text=True)
+    for line in sim.stdout:
+        match = re.search(r"UART1 at \d+ baud on (\S+)", line)
+        if match:
+            break
+    else:
+        raise RuntimeError("the sim exited before opening its UART")
+    # keep reading the console so the firmware never blocks on a full pipe
+    threading.Thread(target=lambda: [None for _ in sim.stdout], daemon=True).start()
+    return sim, match.group(1)
+
+
+def overruns(reply):
+    # name=achieved/rateHz,j<avg>/<max>ms,o<overruns> per job
+    return {job.split("=")[0]: int(job.rsplit(",o", 1)[1]) for job in reply.split()}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        os.mkdir(os.path.join(workdir, "log"))
+        segment_path = os.path.join(workdir, "log", "00000000.seg")
+        write_segment(segment_path)
+        sim, port = start_sim(workdir)
+        try:
+            ser = serial.Serial(port, 115200, timeout=1)
+            time.sleep(SETTLE_S)
+            before = overruns(rs485_host.query(ser, ADDRESS, "sched"))
+
+            out = os.path.join(workdir, "download.seg")
+            start = time.monotonic()
+            received = flashlog_reader.download_segment(ser, ADDRESS, 0, out)
+            elapsed = time.monotonic() - start
+
+            time.sleep(SETTLE_S) # jobs held up by the dump only count once they have run
+            after = overruns(rs485_host.query(ser, ADDRESS, "sched"))
+            with open(segment_path, "rb") as a, open(out, "rb") as b:
+                intact = a.read() == b.read()
+        finally:
+            sim.kill()
+            sim.wait()
+
+    print(f"dumped {received} bytes in {elapsed:.1f} s, intact: {intact}")
+    print(f"overruns before {before}")
+    print(f"overruns after  {after}")
+    assert intact, "the download differs from the segment"
+    assert after == before, "jobs overran during the dump"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import base64
+import csv
+import datetime
+import json
+import os
+import struct
+import time
+
+import rs485_host
+
+# must match libs/flashlog.py
+RECORD_FORMAT = "<IIffff"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+BOOT_MARKER = 0xFFFFFFFF
+TICKS_PERIOD = 1 << 30 # ticks_ms wraps here, about 12.4 days
+
+COLUMNS = ['Timestamp', 'Temperature1', 'Pressure1', 'Temperature2', 'Pressure2']
+
+
+def decode_records(data):
+    """Decode packed records into (seq, ms, t_inner, p_inner, t_outer, p_outer) tuples."""
+    usable = len(data) - len(data) % RECORD_SIZE
+    return list(struct.iter_unpack(RECORD_FORMAT, data[:usable]))
+
+
+def read_segment(path):
+    with open(path, 'rb') as f:
+        return decode_records(f.read())
+
+
+def split_boots(records):
+    """
+    Split records, segments in order, into [(boot, records)] runs from one
+    boot each. A run starts at a boot marker of another boot, or where seq
+    goes back without one, the boot id is None then. Markers are dropped
+    and the device ms unwrapped, so they keep counting up past the wrap.
+    """
+    runs = []
+    boot = run = None
+    for record in records:
+        seq, ms = record[0], record[1]
+        if seq == BOOT_MARKER:
+            if run is None or ms != boot:
+                boot, run, last_seq, last_ms, wraps = ms, [], None, None, 0
+                runs.append((boot, run))
+            continue
+        if run is None or (last_seq is not None and seq <= last_seq):
+            boot, run, last_seq, last_ms, wraps = None, [], None, None, 0
+            runs.append((boot, run))
+        if last_ms is not None and ms + wraps < last_ms:
+            wraps += TICKS_PERIOD
+        last_seq, last_ms = seq, ms + wraps
+        run.append((seq, last_ms) + tuple(record[2:]))
+    return [(boot, run) for boot, run in runs if run]
+
+
+def to_columns(records, anchor=None):
+    """
+    Convert the records of one boot, as split_boots returns them, into the
+    columns the plotter writes.
+
+    Device timestamps are ms since boot. With an anchor of
+    {"device_ms": ..., "host_time": ...} taken while the device was
+    connected in the same boot they are mapped to wall clock time,
+    otherwise the raw device ms are kept. The anchor must be taken less
+    than a ticks_ms period after the last record.
+    """
+    columns = {name: [] for name in COLUMNS}
+    if anchor is not None and records:
+        last_ms = records[-1][1]
+        anchor_ms = last_ms + (anchor["device_ms"] - last_ms) % TICKS_PERIOD
+    for seq, ms, t_inner, p_inner, t_outer, p_outer in records:
+        if anchor is not None:
+            epoch = anchor["host_time"] - (anchor_ms - ms) / 1000
+            timestamp = datetime.datetime.fromtimestamp(epoch).strftime("%Y-%m-%d\n%H:%M:%S")
+        else:
+            timestamp = ms
+        columns['Timestamp'].append(timestamp)
+        columns['Temperature1'].append(t_inner)
+        columns['Pressure1'].append(p_inner)
+        columns['Temperature2'].append(t_outer)
+        columns['Pressure2'].append(p_outer)
+    return columns
+
+
+def list_segments(ser, address):
+    """Return (boot id of the running boot, {segment: size}), (None, {}) on timeout."""
+    reply = rs485_host.query(ser, address, "logs")
+    if not reply:
+        return None, {}
+    boot, _, entries = reply.partition('|')
+    segments = {}
+    for entry in filter(None, entries.split(',')):
+        seg, size = entry.split(':')
+        segments[int(seg)] = int(size)
+    return int(boot), segments
+
+
+def download_segment(ser, address, segment, path, retries=3):
+    """
+    Download a segment into path, resuming from whatever is already there.
+
+    Chunks carry their offset, so a dropped frame just ends the stream
+    early and the next attempt asks again from the last good offset.
+    """
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    with open(path, 'ab') as f:
+        for _ in range(retries):
+            rs485_host.send(ser, address, f"dump {segment} {offset}")
+            while True:
+                reply = rs485_host.read_reply(ser, address)
+                if reply is None:
+                    break
+                if reply.startswith("end,"):
+                    return offset
+                header, payload = reply.split('|', 1)
+                chunk_segment, chunk_offset = (int(v) for v in header.split(','))
+                if chunk_segment != segment or chunk_offset != offset:
+                    break
+                data = base64.b64decode(payload)
+                f.write(data)
+                offset += len(data)
+            f.flush()
+    return offset
+
+
+def load_anchors(out_dir):
+    """{boot id: anchor} for every boot a download has seen."""
+    path = os.path.join(out_dir, "anchors.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {int(boot): anchor for boot, anchor in json.load(f).items()}
+
+
+def download(ser, address, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+
+    # map device ms onto wall clock time while we can still see the device,
+    # anchors of earlier boots are kept for the segments they wrote
+    boot, segments = list_segments(ser, address)
+    reply = rs485_host.query(ser, address, "hist 0")
+    if boot is not None and reply:
+        anchors = load_anchors(out_dir)
+        anchors[boot] = {"device_ms": int(reply.split('|')[0]), "host_time": time.time()}
+        with open(os.path.join(out_dir, "anchors.json"), 'w') as f:
+            json.dump(anchors, f)
+
+    for segment, size in sorted(segments.items()):
+        path = os.path.join(out_dir, f"{segment:08d}.seg")
+        received = download_segment(ser, address, segment, path)
+        print(f"segment {segment}: {received}/{size} bytes")
+
+
+def export_csv(paths, csv_filename, anchors=None):
+    """
+    Write the records of the segments in paths to a plotter style csv.
+
+    With anchors ({boot id: anchor}) only boots that have one are written,
+    in wall clock time, the records of any other boot can't be placed and
+    are left out. Without, every record is written with its device ms.
+    Returns (records written, records left out).
+    """
+    records = []
+    for path in paths:
+        records.extend(read_segment(path))
+    columns = {name: [] for name in COLUMNS}
+    skipped = 0
+    for boot, run in split_boots(records):
+        anchor = None
+        if anchors is not None:
+            anchor = anchors.get(boot)
+            if anchor is None:
+                skipped += len(run)
+                continue
+        for name, values in to_columns(run, anchor).items():
+            columns[name].extend(values)
+    with open(csv_filename, 'w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(COLUMNS)
+        csv_writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+    return len(columns['Timestamp']), skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and decode the sofar controller flash log")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    dl = sub.add_parser("download", help="download all segments, resuming partial ones")
+    dl.add_argument("out_dir")
+    dl.add_argument("--address", default="02")
+    dl.add_argument("--baud", type=int, default=115200)
+
+    ex = sub.add_parser("csv", help="decode downloaded segments into a plotter style csv")
+    ex.add_argument("out_dir")
+    ex.add_argument("csv_filename")
+
+    args = parser.parse_args()
+    if args.action == "download":
+        ser = rs485_host.open_port(args.baud)
+        try:
+            download(ser, args.address, args.out_dir)
+        finally:
+            ser.close()
+    else:
+        anchors = load_anchors(args.out_dir) or None
+        paths = sorted(os.path.join(args.out_dir, name) for name in os.listdir(args.out_dir) if name.endswith(".seg"))
+        written, skipped = export_csv(paths, args.csv_filename, anchors)
+        print(f"{written} rows written, {skipped} from boots without an anchor left out")
@@ -0,0 +1,75 @@
+"""
+Range query latency against archive size, with and without the session index.
+
+Records archives of one session per day, a sample every --interval seconds
+through ColumnLog with the index as its on_block the way data_plotter.py
+does, then times a query over --minutes in the middle of the last day
+through the index and by reading every log.
+python index_bench.py [--days 1 10 100] [--interval 10] [--minutes 15]
+"""
+import argparse
+import datetime
+import glob
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from columnlog import ColumnLog, read_log
+from session_index import SessionIndex
+
+START = datetime.datetime(2024, 8, 29)
+BLOCK_SECONDS = 10 # data_plotter.py flushes every 10 s
+
+
+def record(directory, days, interval, index):
+    block_rows = max(1, BLOCK_SECONDS // interval)
+    for day in range(days):
+        session_start = (START + datetime.timedelta(days=day)).timestamp()
+        name = f"pressure data - {START + datetime.timedelta(days=day)}.col"
+        log = ColumnLog(os.path.join(directory, name), block_rows=block_rows, on_block=index.add_block)
+        for i in range(86400 // interval):
+            log.append(session_start + i * interval, 2, (22.1, 1015.73 + i % 7 * 0.01, 23.8, 1015.38))
+        log.close()
+
+
+def scan(directory, start, end):
+    rows = 0
+    for path in glob.glob(os.path.join(directory, "*.col")):
+        epoch = read_log(path)["epoch"]
+        rows += np.count_nonzero((epoch >= start) & (epoch <= end))
+    return rows
+
+
+def timed(fn, *args, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time range queries with and without the session index")
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--interval", type=int, default=10, help="seconds between samples")
+    parser.add_argument("--minutes", type=float, default=15)
+    args = parser.parse_args()
+
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as directory:
+            index = SessionIndex(directory)
+            record(directory, days, args.interval, index)
+            start = (START + datetime.timedelta(days=days - 1, hours=12)).timestamp()
+            end = start + args.minutes * 60
+            indexed, result = timed(index.query, start, end)
+            scanned, rows = timed(scan, directory, start, end, repeat=3)
+            assert rows == len(result["epoch"])
+            print(f"{days} days, {len(index.records())} records: {rows} samples from {index.blocks_read} blocks, "
+                  f"index {indexed * 1000:.2f} ms, scan {scanned * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
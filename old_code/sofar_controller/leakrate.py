@@ -0,0 +1,213 @@
+"""
+Streaming leak rate analysis of the inner and outer pressures.
+
+The hull leak rate is the slope of the differential, inner minus outer
+pressure, over time. For every device, channel and window, a
+RollingRegression keeps the mean, standard deviation and least squares
+slope of the samples of the last window seconds. Adding a sample is O(1):
+its sums are added, those of the samples leaving the window taken away.
+Channels are the four readings and the differential, in hPa and °C.
+
+A window is judged once it spans min_fill of its length: pass if the
+differential's slope is below limit hPa/h by more than Z standard errors,
+fail if it is above by as much, and unsure in between. The verdict is given
+to on_verdict when it changes.
+
+python leakrate.py [directory] [--windows 600 3600] [--limit 0.5]
+runs the same analysis over the session csvs.
+"""
+import argparse
+import collections
+import datetime
+import math
+
+import numpy as np
+
+import csv_loader
+from session_index import CSV_DEVICE
+
+CHANNELS = csv_loader.COLUMNS + ("differential",)
+DIFFERENTIAL = CHANNELS.index("differential")
+WINDOWS = (600, 3600) # seconds
+LIMIT = 0.5 # hPa/h of differential change a sealed hull stays under
+Z = 2.0 # standard errors between the slope and the limit for a verdict
+MIN_FILL = 0.9
+
+PASS = "pass"
+FAIL = "fail"
+UNSURE = "unsure"
+
+
+class RollingRegression:
+    """
+    Mean, standard deviation and least squares slope of y over t for the
+    samples in the last window seconds, updated as samples come and go.
+    Times are kept relative to the first sample so the sums stay small, and
+    the sums are worked out again from the window each time it has turned
+    over, so rounding cannot build up. That costs O(1) a sample on average.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = collections.deque()
+        self.origin = None
+        self.removed = 0
+        self._clear()
+
+    def _clear(self):
+        self.n = 0
+        self.mean_t = 0.0
+        self.mean_y = 0.0
+        self.c_tt = 0.0 # sums of products of deviations from the means
+        self.c_ty = 0.0
+        self.c_yy = 0.0
+
+    def _add(self, t, y):
+        self.n += 1
+        dt = t - self.mean_t
+        dy = y - self.mean_y
+        self.mean_t += dt / self.n
+        self.mean_y += dy / self.n
+        self.c_tt += dt * (t - self.mean_t)
+        self.c_ty += dt * (y - self.mean_y)
+        self.c_yy += dy * (y - self.mean_y)
+
+    def _remove(self, t, y):
+        if self.n == 1:
+            self._clear()
+            return
+        self.n -= 1
+        dt = t - self.mean_t
+        dy = y - self.mean_y
+        self.mean_t -= dt / self.n
+        self.mean_y -= dy / self.n
+        self.c_tt -= dt * (t - self.mean_t)
+        self.c_ty -= dt * (y - self.mean_y)
+        self.c_yy -= dy * (y - self.mean_y)
+
+    def add(self, epoch, y):
+        if self.origin is None:
+            self.origin = epoch
+        t = epoch - self.origin
+        self.samples.append((t, y))
+        self._add(t, y)
+        while t - self.samples[0][0] > self.window:
+            self._remove(*self.samples.popleft())
+            self.removed += 1
+        if self.removed >= len(self.samples):
+            self._clear()
+            for sample in self.samples:
+                self._add(*sample)
+            self.removed = 0
+
+    @property
+    def span(self):
+        return self.samples[-1][0] - self.samples[0][0] if self.samples else 0.0
+
+    @property
+    def mean(self):
+        return self.mean_y if self.n else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.c_yy, 0.0) / (self.n - 1)) if self.n > 1 else math.nan
+
+    @property
+    def slope(self):
+        """Per second."""
+        return self.c_ty / self.c_tt if self.n > 1 and self.c_tt > 0 else math.nan
+
+    @property
+    def slope_error(self):
+        """Standard error of the slope."""
+        if self.n < 3 or self.c_tt <= 0:
+            return math.nan
+        residual = max(self.c_yy - self.c_ty * self.c_ty / self.c_tt, 0.0)
+        return math.sqrt(residual / (self.n - 2) / self.c_tt)
+
+
+def judge(regression, limit=LIMIT, z=Z, min_fill=MIN_FILL):
+    """PASS, FAIL or UNSURE for the leak rate in a differential regression, None until the window is filled."""
+    if regression.span < regression.window * min_fill:
+        return None
+    rate = abs(regression.slope) * 3600
+    margin = z * regression.slope_error * 3600
+    if rate + margin < limit:
+        return PASS
+    if rate - margin > limit:
+        return FAIL
+    return UNSURE
+
+
+class LeakMonitor:
+    """
+    The regressions of every device, channel and window. add() takes a
+    sample, values in read reply order (t_inner, p_inner, t_outer, p_outer).
+    on_verdict(device, window, epoch, verdict, regression) is called when a
+    window's verdict changes.
+    """
+
+    def __init__(self, windows=WINDOWS, limit=LIMIT, z=Z, min_fill=MIN_FILL, on_verdict=None):
+        self.windows = tuple(windows)
+        self.limit = limit
+        self.z = z
+        self.min_fill = min_fill
+        self.on_verdict = on_verdict
+        self.devices = {} # device: [[regression per window] per channel]
+        self.verdicts = {} # (device, window): verdict
+
+    def add(self, device, epoch, values):
+        channels = self.devices.get(device)
+        if channels is None:
+            channels = self.devices[device] = [[RollingRegression(window) for window in self.windows] for _ in CHANNELS]
+        values = (*values, values[1] - values[3])
+        for regressions, value in zip(channels, values):
+            for regression in regressions:
+                regression.add(epoch, value)
+
+        for window, regression in zip(self.windows, channels[DIFFERENTIAL]):
+            verdict = judge(regression, self.limit, self.z, self.min_fill)
+            if verdict != self.verdicts.get((device, window)):
+                self.verdicts[device, window] = verdict
+                if self.on_verdict is not None:
+                    self.on_verdict(device, window, epoch, verdict, regression)
+
+    def regression(self, device, channel, window):
+        return self.devices[device][CHANNELS.index(channel)][self.windows.index(window)]
+
+    def summary(self, device):
+        """One line per window: differential mean, std and rate with its verdict."""
+        lines = []
+        for window, regression in zip(self.windows, self.devices[device][DIFFERENTIAL]):
+            lines.append(f"device {device:02d} {window:g} s: differential {regression.mean:.3f} ± {regression.std:.3f} hPa, "
+                         f"rate {regression.slope * 3600:+.3f} ± {regression.slope_error * 3600:.3f} hPa/h, "
+                         f"{self.verdicts.get((device, window)) or 'filling'}")
+        return lines
+
+
+def format_verdict(device, window, epoch, verdict, regression):
+    when = datetime.datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+    return (f"{when} device {device:02d} {window:g} s window: {verdict or 'filling'}, "
+            f"rate {regression.slope * 3600:+.3f} ± {regression.slope_error * 3600:.3f} hPa/h")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leak rate analysis of the session csvs")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--windows", type=float, nargs="+", default=WINDOWS, help="seconds")
+    parser.add_argument("--limit", type=float, default=LIMIT, help="hPa/h")
+    parser.add_argument("--z", type=float, default=Z)
+    args = parser.parse_args()
+
+    for path, columns in csv_loader.load_directory(args.directory).items():
+        if not len(columns["timestamp"]):
+            continue
+        print(path)
+        monitor = LeakMonitor(args.windows, args.limit, args.z,
+                              on_verdict=lambda *verdict: print("  " + format_verdict(*verdict)))
+        epoch = csv_loader.local_epoch(columns["timestamp"])
+        values = np.column_stack([columns[name] for name in csv_loader.COLUMNS])
+        for when, row in zip(epoch.tolist(), values.tolist()):
+            monitor.add(CSV_DEVICE, when, row)
+        for line in monitor.summary(CSV_DEVICE):
+            print("  " + line)
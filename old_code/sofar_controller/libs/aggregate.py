@@ -0,0 +1,124 @@
+from array import array
+import _thread
+
+# channel order matches the read reply
+T_INNER = 0
+P_INNER = 1
+T_OUTER = 2
+P_OUTER = 3
+CHANNELS = 4
+
+# (bucket length in ms, number of buckets kept)
+DEFAULT_TIERS = ((1000, 60), (10000, 90), (60000, 240))
+
+
+class Tier:
+    def __init__(self, period_ms, size, channels=CHANNELS):
+        self.period_ms = period_ms
+        self.size = size
+        self.channels = channels
+        self.head = -1 # index of the open bucket
+        self.closed = 0 # number of buckets closed so far
+
+        n = size * channels
+        self.start = array("L", [0] * size)
+        self.count = array("L", [0] * n)
+        self.min = array("f", [0] * n)
+        self.max = array("f", [0] * n)
+        self.sum = array("f", [0] * n)
+
+    def open(self, start):
+        self.head = (self.head + 1) % self.size
+        self.start[self.head] = start
+        base = self.head * self.channels
+        for i in range(base, base + self.channels):
+            self.count[i] = 0
+            self.sum[i] = 0
+
+    def add(self, ch, count, vmin, vmax, vsum):
+        i = self.head * self.channels + ch
+        if self.count[i] == 0:
+            self.min[i] = vmin
+            self.max[i] = vmax
+        else:
+            if vmin < self.min[i]:
+                self.min[i] = vmin
+            if vmax > self.max[i]:
+                self.max[i] = vmax
+        self.count[i] += count
+        self.sum[i] += vsum
+
+    def newest_closed(self, n, skip=0):
+        """Return bucket indices of the newest closed buckets, oldest first."""
+        available = min(self.closed, self.size - 1) - skip
+        n = min(n, available)
+        if n <= 0:
+            return []
+        return [(self.head - skip - k) % self.size for k in range(n, 0, -1)]
+
+
+class AggregateTiers:
+    """
+    Cascading min/max/mean/count buckets in fixed memory.
+
+    Raw values only ever touch the first tier. When a bucket closes it is
+    merged into the bucket of the next tier, so every tier is updated
+    incrementally and costs the same no matter how long the test runs.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, channels=CHANNELS):
+        self.channels = channels
+        self.tiers = [Tier(period_ms, size, channels) for period_ms, size in tiers]
+        self._lock = _thread.allocate_lock()
+
+    def _roll(self, k, ms):
+        tier = self.tiers[k]
+        start = ms - ms % tier.period_ms
+        if tier.head >= 0 and tier.start[tier.head] == start:
+            return
+
+        if tier.head >= 0:
+            closed = tier.head
+            tier.closed += 1
+            if k + 1 < len(self.tiers):
+                parent = self.tiers[k + 1]
+                self._roll(k + 1, tier.start[closed])
+                base = closed * self.channels
+                for ch in range(self.channels):
+                    i = base + ch
+                    if tier.count[i]:
+                        parent.add(ch, tier.count[i], tier.min[i], tier.max[i], tier.sum[i])
+
+        tier.open(start)
+
+    def update(self, ms, ch, value):
+        with self._lock:
+            self._roll(0, ms)
+            self.tiers[0].add(ch, 1, value, value, value)
+
+    def query(self, tier_index, n, skip=0):
+        """Return (start, [(count, min, max, mean) per channel]) for the newest closed buckets of a tier."""
+        tier = self.tiers[tier_index]
+        buckets = []
+        with self._lock:
+            for b in tier.newest_closed(n, skip):
+                channels = []
+                base = b * self.channels
+                for ch in range(self.channels):
+                    i = base + ch
+                    count = tier.count[i]
+                    mean = tier.sum[i] / count if count else 0
+                    channels.append((count, tier.min[i], tier.max[i], mean))
+                buckets.append((tier.start[b], channels))
+        return buckets
+
+    @staticmethod
+    def format(buckets, now_ms):
+        """Format buckets for a single reply frame: now|start,count,min,max,mean,...|..."""
+        parts = [str(now_ms)]
+        for start, channels in buckets:
+            fields = [str(start)]
+            for count, vmin, vmax, mean in channels:
+                fields.append(f"{count},{vmin:.2f},{vmax:.2f},{mean:.3f}")
+            parts.append(",".join(fields))
+        return "|".join(parts)
@@ -0,0 +1,56 @@
+import time
+
+SUPPORTED_BAUDS = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+VERIFY_MS = 2000 # rs485_host.negotiate_baud waits this long too
+
+
+class BaudNegotiator:
+    """
+    Switches the link to a new baud rate and falls back if it does not work.
+
+    The master sends 'baud <rate>', the device acks at the old rate and then
+    switches. The switch is only kept once a frame addressed to this device
+    arrives at the new rate (the master pings to verify), if none arrives
+    within verify_ms the device goes back to the old rate by itself. The
+    master falls back the same way when its ping goes unanswered.
+
+    Only for a single device on the bus: every other device stays at the
+    old rate and can't be reached until the master switches back.
+    """
+
+    def __init__(self, set_baud, baudrate, verify_ms=VERIFY_MS):
+        self.set_baud = set_baud
+        self.baudrate = baudrate
+        self.verify_ms = verify_ms
+        self.requested = None
+        self.fallback = None
+        self.deadline = 0
+        self.fallbacks = 0
+
+    def request(self, rate):
+        """Ask for a switch to rate, it happens once the frame asking for it has been answered."""
+        if rate not in SUPPORTED_BAUDS:
+            raise ValueError(f"Unsupported baud rate: {rate}")
+        self.requested = rate
+
+    def after_frame(self, handled):
+        """Call after every frame, handled is True if it was addressed to this device."""
+        if self.requested is not None:
+            self.fallback = self.baudrate
+            self.deadline = time.ticks_add(time.ticks_ms(), self.verify_ms)
+            self.baudrate = self.requested
+            self.requested = None
+            self.set_baud(self.baudrate)
+        elif handled:
+            # a frame got through at the new rate, keep it
+            self.fallback = None
+
+    def poll(self):
+        """Fall back if the new rate was not verified in time, returns True if it did."""
+        if self.fallback is None or time.ticks_diff(time.ticks_ms(), self.deadline) < 0:
+            return False
+        self.baudrate = self.fallback
+        self.fallback = None
+        self.fallbacks += 1
+        self.set_baud(self.baudrate)
+        return True
@@ -0,0 +1,98 @@
+import struct
+from array import array
+
+# frame: sync, to, from, type, payload length, payload, crc16 over everything after sync
+SYNC = 0xA5
+HEADER_FORMAT = "<BBBBH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CRC_SIZE = 2
+MAX_PAYLOAD = 1024
+
+# request types, replies carry the same type with REPLY set
+READ = 0x01
+HIST = 0x02
+SINCE = 0x03
+TEXT = 0x7F # payload is an ascii command line, reply payload is the ascii reply
+REPLY = 0x80
+
+# device ms, t_inner, p_inner, t_outer, p_outer
+READING_FORMAT = "<Iffff"
+# count, device ms now, followed by count SAMPLE_FORMAT records
+BLOCK_FORMAT = "<HI"
+SAMPLE_FORMAT = "<IIffff"
+READING_SIZE = struct.calcsize(READING_FORMAT)
+BLOCK_SIZE = struct.calcsize(BLOCK_FORMAT)
+SAMPLE_SIZE = struct.calcsize(SAMPLE_FORMAT)
+
+
+def _make_crc_table():
+    table = array("H", [0] * 256)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE."""
+    table = _CRC_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ b]
+    return crc
+
+
+def encode(to_address, from_address, frame_type, payload=b""):
+    frame = bytearray(HEADER_SIZE + len(payload) + CRC_SIZE)
+    struct.pack_into(HEADER_FORMAT, frame, 0, SYNC, to_address, from_address, frame_type, len(payload))
+    frame[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload
+    crc = crc16(memoryview(frame)[1:HEADER_SIZE + len(payload)])
+    struct.pack_into("<H", frame, HEADER_SIZE + len(payload), crc)
+    return frame
+
+
+def frame_length(buf, offset=0):
+    """Total frame length from a header at buf[offset:], -1 if the length is out of range."""
+    length = buf[offset + 4] | (buf[offset + 5] << 8)
+    if length > MAX_PAYLOAD:
+        return -1
+    return HEADER_SIZE + length + CRC_SIZE
+
+
+def decode(frame):
+    """Return (to, from, type, payload) or None if the crc does not match."""
+    length = len(frame) - CRC_SIZE
+    crc = frame[length] | (frame[length + 1] << 8)
+    if crc16(frame[1:length]) != crc:
+        return None
+    return frame[1], frame[2], frame[3], frame[HEADER_SIZE:length]
+
+
+def pack_reading(ms, t_inner, p_inner, t_outer, p_outer):
+    return struct.pack(READING_FORMAT, ms, t_inner, p_inner, t_outer, p_outer)
+
+
+def unpack_reading(payload):
+    return struct.unpack(READING_FORMAT, payload)
+
+
+def pack_samples(samples, now_ms):
+    """Pack (seq, ms, t_inner, p_inner, t_outer, p_outer) samples into a history block."""
+    block = bytearray(BLOCK_SIZE + SAMPLE_SIZE * len(samples))
+    struct.pack_into(BLOCK_FORMAT, block, 0, len(samples), now_ms)
+    offset = BLOCK_SIZE
+    for sample in samples:
+        struct.pack_into(SAMPLE_FORMAT, block, offset, *sample)
+        offset += SAMPLE_SIZE
+    return block
+
+
+def unpack_samples(payload):
+    """Return (now_ms, samples) from a history block."""
+    count, now_ms = struct.unpack_from(BLOCK_FORMAT, payload, 0)
+    samples = [struct.unpack_from(SAMPLE_FORMAT, payload, BLOCK_SIZE + i * SAMPLE_SIZE) for i in range(count)]
+    return now_ms, samples
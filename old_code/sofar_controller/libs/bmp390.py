@@ -1,6 +1,10 @@
 from machine import I2C, Pin
 import struct
 import time
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 # Constants
 _BMP390_CHIP_ID = const(0x60)
@@ -72,12 +76,31 @@ class BMP390:
             coeff[13] / 2**65.0, # P11
         )
 
-    def _read(self):
+    def _start_conversion(self):
         self._write_byte(_REGISTER_CONTROL, 0x13)
 
-        while self._read_byte(_REGISTER_STATUS) & 0x60 != 0x60:
+    def _ready(self):
+        return self._read_byte(_REGISTER_STATUS) & 0x60 == 0x60
+
+    def _read(self):
+        self._start_conversion()
+
+        while not self._ready():
             time.sleep(self._wait_time)
 
+        return self._compensate()
+
+    async def read_async(self):
+        """Like read(), but awaits the conversion instead of blocking on it."""
+        self._start_conversion()
+
+        while not self._ready():
+            await asyncio.sleep(self._wait_time)
+
+        pressure, temperature = self._compensate()
+        return pressure / 100, temperature
+
+    def _compensate(self):
         data = self._read_register(_REGISTER_PRESSUREDATA, 6)
         adc_p = data[2] << 16 | data[1] << 8 | data[0]
         adc_t = data[5] << 16 | data[4] << 8 | data[3]
@@ -108,6 +131,11 @@ class BMP390:
 
         return pressure, temperature
 
+    def read(self):
+        """Return (pressure in hPa, temperature in C) from a single conversion."""
+        pressure, temperature = self._read()
+        return pressure / 100, temperature
+
     @property
     def pressure(self):
         return self._read()[0] / 100
@@ -0,0 +1,46 @@
+class CaptureSlots:
+    """
+    A few tagged slots for synchronized captures.
+
+    A broadcast 'capture <id>' reaches every device at the same instant and
+    each one starts a conversion of both sensors right away. The slot is
+    reserved then and filled once both readings are in, together with
+    their ages at the broadcast (negative, they were taken after it). The
+    master collects the slots one device at a time afterwards, a slot that
+    is not filled yet is reported as pending. The ages let the master work
+    out when each reading was really taken.
+    """
+
+    def __init__(self, size=8):
+        self.ids = [None] * size
+        self.slots = [None] * size
+        self.next = 0
+
+    def begin(self, capture_id):
+        """Reserve a slot, False if the id was seen before."""
+        if capture_id in self.ids:
+            # a repeated broadcast must not move the latch point
+            return False
+        self.ids[self.next] = capture_id
+        self.slots[self.next] = None
+        self.next = (self.next + 1) % len(self.ids)
+        return True
+
+    def latch(self, capture_id, inner_age_ms, outer_age_ms, t_inner, p_inner, t_outer, p_outer):
+        if capture_id not in self.ids:
+            # its slot was taken by newer captures in the meantime
+            return
+        self.slots[self.ids.index(capture_id)] = (inner_age_ms, outer_age_ms, t_inner, p_inner, t_outer, p_outer)
+
+    def get(self, capture_id):
+        """The slot of a capture, None while it is pending."""
+        if capture_id not in self.ids:
+            raise ValueError(f"Unknown capture: {capture_id}")
+        return self.slots[self.ids.index(capture_id)]
+
+    @staticmethod
+    def format(capture_id, slot):
+        if slot is None:
+            return f"{capture_id},pending"
+        inner_age_ms, outer_age_ms, t_inner, p_inner, t_outer, p_outer = slot
+        return f"{capture_id},{inner_age_ms},{outer_age_ms},{t_inner:.2f},{p_inner:.3f},{t_outer:.2f},{p_outer:.3f}"
@@ -0,0 +1,187 @@
+import time
+import binframe
+
+_COLON = const(58)
+
+
+def parse_header(line):
+    """
+    Split a 'to:from:cmd args' frame into (to, from, cmd, args).
+
+    Slices at the fixed header offsets instead of matching a regex, works
+    on bytes or a memoryview and returns None if the frame is malformed.
+    """
+    if len(line) < 7 or line[2] != _COLON or line[5] != _COLON:
+        return None
+    text = bytes(line).decode("ascii")
+    to_address = text[0:2]
+    from_address = text[3:5]
+    if not (to_address.isdigit() and from_address.isdigit()):
+        return None
+    command, _, args = text[6:].rstrip().partition(" ")
+    return to_address, from_address, command, args
+
+
+class CommandTable:
+    """
+    Dict based command dispatch for the RS485 protocol.
+
+    Handlers take the argument string and return the reply, or None if they
+    already wrote their own replies. A ValueError or IndexError from a
+    handler is answered with '?'. Static replies are formatted once when
+    they are registered.
+
+    Binary frames (see binframe) are answered in kind. Binary handlers take
+    the payload and return the reply payload, and a TEXT frame runs an
+    ordinary command with its reply wrapped in a binary frame.
+
+    Frames sent to the broadcast address only run broadcast commands and
+    are never answered, every device on the bus would reply at once.
+
+    A frame can carry a batch of ';' separated commands, their replies come
+    back in order in one ';' separated reply. Only the first max_batch
+    commands of a batch are run, the rest are answered with '?'.
+    """
+
+    def __init__(self, address, write, broadcast="99", max_batch=8):
+        self.address = address
+        self.broadcast = broadcast
+        self.max_batch = max_batch
+        self.write = write
+        self.address_id = int(address)
+        self.handlers = {}
+        self.static = {}
+        self.static_text = {}
+        self.binary_handlers = {}
+        self.broadcast_handlers = {}
+        self.crc_errors = 0
+
+        self.last_received = time.time()
+        self.last_from = "None"
+        self.last_command = "Waiting for 1st msg"
+        self.last_args = ""
+
+    def command(self, name, handler):
+        self.handlers[name] = handler
+
+    def static_reply(self, name, reply):
+        self.static[name] = self.frame(reply)
+        self.static_text[name] = reply
+
+    def binary_command(self, frame_type, handler):
+        self.binary_handlers[frame_type] = handler
+
+    def broadcast_command(self, name, handler):
+        self.broadcast_handlers[name] = handler
+
+    def frame(self, msg):
+        return f"00:{self.address}:{msg}\r\n".encode("ascii")
+
+    def respond(self, msg):
+        self.write(self.frame(msg))
+
+    def dispatch(self, line):
+        """Handle one frame, returns False if it was not addressed to this device."""
+        header = parse_header(line)
+        if header is None:
+            return False
+        to_address, from_address, command, args = header
+        if to_address == self.broadcast:
+            return self._dispatch_broadcast(command, args)
+        if to_address != self.address:
+            return False
+
+        self.last_received = time.time()
+        self.last_from = from_address
+        self.last_command = command
+        self.last_args = args
+
+        print(f"from '{from_address}' to '{to_address}': '{command} {args}'")
+
+        if ";" in command or ";" in args:
+            self.respond(self._run_batch(command, args))
+            return True
+
+        reply = self.static.get(command)
+        if reply is not None:
+            self.write(reply)
+            return True
+
+        reply = self._run(command, args)
+        if reply is not None:
+            self.respond(reply)
+        return True
+
+    def _dispatch_broadcast(self, command, args):
+        handler = self.broadcast_handlers.get(command)
+        if handler is None:
+            return False
+        try:
+            handler(args)
+        except (ValueError, IndexError):
+            pass
+        return True
+
+    def _run_batch(self, command, args):
+        body = f"{command} {args}" if args else command
+        replies = []
+        for i, part in enumerate(body.split(";")):
+            if i >= self.max_batch:
+                replies.append("?")
+                continue
+            name, _, part_args = part.strip().partition(" ")
+            reply = self.static_text.get(name)
+            if reply is None:
+                reply = self._run(name, part_args)
+            replies.append("" if reply is None else reply)
+        return ";".join(replies)
+
+    def _run(self, command, args):
+        handler = self.handlers.get(command)
+        if handler is None:
+            return "?"
+        try:
+            return handler(args)
+        except (ValueError, IndexError):
+            return "?"
+
+    def dispatch_binary(self, frame):
+        """Handle one binary frame, returns False if it was corrupt or not addressed to this device."""
+        decoded = binframe.decode(frame)
+        if decoded is None:
+            self.crc_errors += 1
+            return False
+        to_address, from_address, frame_type, payload = decoded
+        if to_address != self.address_id:
+            return False
+
+        self.last_received = time.time()
+        self.last_from = f"{from_address:02d}"
+
+        if frame_type == binframe.TEXT:
+            command, _, args = bytes(payload).decode("ascii").rstrip().partition(" ")
+            self.last_command = command
+            self.last_args = args
+            if ";" in command or ";" in args:
+                reply = self._run_batch(command, args)
+            else:
+                reply = self.static_text.get(command)
+                if reply is None:
+                    reply = self._run(command, args)
+            if reply is None:
+                return True
+            reply = reply.encode("ascii")
+        else:
+            self.last_command = f"bin {frame_type}"
+            self.last_args = ""
+            handler = self.binary_handlers.get(frame_type)
+            try:
+                reply = handler(payload) if handler is not None else None
+            except (ValueError, IndexError):
+                reply = None
+            if reply is None:
+                frame_type = binframe.TEXT
+                reply = b"?"
+
+        self.write(binframe.encode(from_address, self.address_id, frame_type | binframe.REPLY, reply))
+        return True
@@ -0,0 +1,130 @@
+import os
+import struct
+import time
+import binascii
+import _thread
+
+# seq, device ms, t_inner, p_inner, t_outer, p_outer
+RECORD_FORMAT = "<IIffff"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+PAGE_SIZE = 4096
+SEGMENT_PAGES = 16
+MAX_SEGMENTS = 16
+# seq of the record every segment starts with, its ms field is the boot id
+BOOT_MARKER = 0xFFFFFFFF
+
+
+class FlashLog:
+    """
+    Append-only segment log of binary sample records on the flash filesystem.
+    The default path is relative to the working directory, which is the
+    flash root on the device.
+
+    Records are packed into a page sized buffer and only written when the
+    page is full (or the flush interval passes), so flash sees one write per
+    page instead of one per sample. Segment files are only ever appended to
+    and the oldest segment is deleted once MAX_SEGMENTS are in use, which
+    spreads the writes over the whole log area.
+
+    seq and ticks_ms start over at every boot, so every boot starts a new
+    segment and its number is the boot id. Each segment begins with a
+    BOOT_MARKER record holding the boot id, so the reader can tell which
+    boot the records of a segment came from.
+    """
+
+    def __init__(self, path="log", segment_pages=SEGMENT_PAGES, max_segments=MAX_SEGMENTS, flush_interval_ms=300000):
+        self.path = path
+        # the boot marker and segment_pages full pages
+        self.segment_size = RECORD_SIZE + segment_pages * (PAGE_SIZE // RECORD_SIZE) * RECORD_SIZE
+        self.max_segments = max_segments
+        self.flush_interval_ms = flush_interval_ms
+        self.enabled = True
+        self.write_errors = 0
+        self._lock = _thread.allocate_lock()
+
+        self._page = bytearray((PAGE_SIZE // RECORD_SIZE) * RECORD_SIZE)
+        self._fill = 0
+        self._last_flush = time.ticks_ms()
+
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass # already exists
+
+        segments = self.segments()
+        self.segment = self.boot = segments[-1] + 1 if segments else 0
+        self._segment_bytes = 0 # nothing written to this segment yet
+
+    def _name(self, segment):
+        return f"{self.path}/{segment:08d}.seg"
+
+    def segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.path) if name.endswith(".seg"))
+
+    def segment_length(self, segment):
+        try:
+            return os.stat(self._name(segment))[6]
+        except OSError:
+            return 0
+
+    def append(self, seq, ms, t_inner, p_inner, t_outer, p_outer):
+        if not self.enabled:
+            return
+        with self._lock:
+            struct.pack_into(RECORD_FORMAT, self._page, self._fill, seq, ms, t_inner, p_inner, t_outer, p_outer)
+            self._fill += RECORD_SIZE
+            if self._fill >= len(self._page) or time.ticks_diff(ms, self._last_flush) >= self.flush_interval_ms:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.ticks_ms()
+        if self._fill == 0:
+            return
+
+        if self._segment_bytes + self._fill > self.segment_size:
+            self._rotate()
+
+        try:
+            if not self._segment_bytes:
+                self._start_segment()
+            with open(self._name(self.segment), "ab") as f:
+                f.write(memoryview(self._page)[:self._fill])
+            self._segment_bytes += self._fill
+        except OSError:
+            self.write_errors += 1
+        self._fill = 0
+
+    def _rotate(self):
+        self.segment += 1
+        self._segment_bytes = 0
+
+    def _start_segment(self):
+        segments = self.segments()
+        while len(segments) >= self.max_segments:
+            os.remove(self._name(segments.pop(0)))
+        with open(self._name(self.segment), "wb") as f:
+            f.write(struct.pack(RECORD_FORMAT, BOOT_MARKER, self.boot, 0, 0, 0, 0))
+        self._segment_bytes = RECORD_SIZE
+
+    def read_chunk(self, segment, offset, size):
+        """Read up to size bytes of a segment from offset, empty once the end is reached."""
+        with self._lock:
+            if segment == self.segment and self._fill:
+                # make the buffered page visible to downloads of the live segment
+                self._flush()
+        try:
+            with open(self._name(segment), "rb") as f:
+                f.seek(offset)
+                return f.read(size)
+        except OSError:
+            return b""
+
+    @staticmethod
+    def encode_chunk(segment, offset, data):
+        """Format a download chunk for a reply frame: seg,offset|base64."""
+        return f"{segment},{offset}|" + binascii.b2a_base64(data).decode("ascii").strip()
@@ -0,0 +1,66 @@
+import time
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class FramePacer:
+    """
+    Decides when the UI draws a frame.
+
+    The UI task sleeps until something calls wake() (a new sample, a button
+    press, a message, the idle tick), then draws one frame for everything
+    that happened since, at most target_fps times a second. A frame is
+    missed when it finished more than one frame period after the wake that
+    asked for it.
+    """
+
+    def __init__(self, target_fps=10):
+        self.event = asyncio.Event()
+        self.set_fps(target_fps)
+        self.woken_at = None
+        self.last_frame = time.ticks_ms()
+        self._frame_woken = None
+        self.reset_stats()
+
+    def set_fps(self, target_fps):
+        if target_fps <= 0:
+            raise ValueError(f"Invalid frame rate: {target_fps}")
+        self.target_fps = target_fps
+        self.frame_ms = max(1, int(1000 / target_fps))
+
+    def reset_stats(self):
+        self.frames = 0
+        self.drawn = 0
+        self.missed = 0
+        self.latency_max = 0
+
+    def wake(self):
+        if self.woken_at is None:
+            self.woken_at = time.ticks_ms()
+        self.event.set()
+
+    async def wait(self):
+        """Wait for a wake, then until a frame slot is free."""
+        await self.event.wait()
+        wait = time.ticks_diff(time.ticks_add(self.last_frame, self.frame_ms), time.ticks_ms())
+        if wait > 0:
+            await asyncio.sleep_ms(wait)
+        # wakes up to here are served by this frame, later ones get the next
+        self.event.clear()
+        self._frame_woken = self.woken_at
+        self.woken_at = None
+        self.last_frame = time.ticks_ms()
+
+    def done(self, drawn):
+        """Call after each frame, drawn is False if nothing changed and the display was left alone."""
+        self.frames += 1
+        if drawn:
+            self.drawn += 1
+        if self._frame_woken is not None:
+            latency = time.ticks_diff(time.ticks_ms(), self._frame_woken)
+            if latency > self.latency_max:
+                self.latency_max = latency
+            if latency > self.frame_ms:
+                self.missed += 1
@@ -0,0 +1,64 @@
+from array import array
+import _thread
+
+
+class SampleHistory:
+    """
+    Fixed size ring buffer of timestamped inner and outer samples.
+
+    Every sample gets a sequence number that only ever increases, so a host
+    can ask for everything since the last sequence number it has seen and
+    backfill whatever it missed while it was not polling.
+    """
+
+    def __init__(self, size=512):
+        self.size = size
+        self.next_seq = 0
+        self._lock = _thread.allocate_lock()
+
+        self.seq = array("L", [0] * size)
+        self.ms = array("L", [0] * size)
+        self.t_inner = array("f", [0] * size)
+        self.p_inner = array("f", [0] * size)
+        self.t_outer = array("f", [0] * size)
+        self.p_outer = array("f", [0] * size)
+
+    def append(self, ms, t_inner, p_inner, t_outer, p_outer):
+        with self._lock:
+            i = self.next_seq % self.size
+            self.seq[i] = self.next_seq
+            self.ms[i] = ms
+            self.t_inner[i] = t_inner
+            self.p_inner[i] = p_inner
+            self.t_outer[i] = t_outer
+            self.p_outer[i] = p_outer
+            self.next_seq += 1
+
+    def oldest_seq(self):
+        return max(0, self.next_seq - self.size)
+
+    def _indices(self, first_seq, count):
+        first_seq = max(first_seq, self.oldest_seq())
+        last_seq = min(self.next_seq, first_seq + count)
+        return [s % self.size for s in range(first_seq, last_seq)]
+
+    def last(self, n):
+        """Return the newest n samples as (seq, ms, t_inner, p_inner, t_outer, p_outer) tuples, oldest first."""
+        with self._lock:
+            return [self._sample(i) for i in self._indices(self.next_seq - n, n)]
+
+    def since(self, seq, limit):
+        """Return up to limit samples with a sequence number >= seq, oldest first."""
+        with self._lock:
+            return [self._sample(i) for i in self._indices(seq, limit)]
+
+    def _sample(self, i):
+        return (self.seq[i], self.ms[i], self.t_inner[i], self.p_inner[i], self.t_outer[i], self.p_outer[i])
+
+    @staticmethod
+    def format(samples, now_ms):
+        """Format samples for a single reply frame: now|seq,ms,ti,pi,to,po|..."""
+        parts = [str(now_ms)]
+        for seq, ms, ti, pi, to, po in samples:
+            parts.append(f"{seq},{ms},{ti:.2f},{pi:.3f},{to:.2f},{po:.3f}")
+        return "|".join(parts)
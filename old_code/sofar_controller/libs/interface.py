@@ -76,6 +76,9 @@ font5x7 = {
     'Z': [0x11, 0x19, 0x15, 0x13, 0x11],  # Z
 }
 
+# font5x7 indexed by character code, lower case maps to upper case like sprint does
+_GLYPHS = [font5x7.get(chr(code).upper()) for code in range(128)]
+
 class InterfaceBoard:
     btns = {
         "UP" : 6,
@@ -125,6 +128,8 @@ class InterfaceBoard:
     
     def getBtn(self, btn):
         return self.pcf.pin(self.btns[btn])
+
+    get_btn = getBtn
     
     def register_button_callback(self, btn, callback):
         """
@@ -159,22 +164,28 @@ class InterfaceBoard:
     def draw_small_char(self, char, x, y, c=1):
         """Draw a single 5x7 character at position (x, y) on the OLED display."""
         if char in font5x7:
-            char_data = font5x7[char]
-            print(f"printing: {font5x7[char]}")
-            for col in range(5):  # Each character is 5 pixels wide
-                byte = char_data[col]
-                
-                for row in range(7):  # Each character is 7 pixels tall
-                    # Draw pixel if the corresponding bit in the byte is set
-                    if byte & (1 << row):
-                        self.oled.pixel(x + col, y + row, c)
-             
-             
+            self._draw_glyph(font5x7[char], x, y, c)
+
+    def _draw_glyph(self, char_data, x, y, c):
+        for col in range(5):  # Each character is 5 pixels wide
+            byte = char_data[col]
+            for row in range(7):  # Each character is 7 pixels tall
+                # Draw pixel if the corresponding bit in the byte is set
+                if byte & (1 << row):
+                    self.oled.pixel(x + col, y + row, c)
+
     def sprint(self, text, x, y, c=1):
         """Draw a string of text on the OLED display starting at position (x, y) with the specified color."""
         for i, char in enumerate(text.upper()):
             self.draw_small_char(char, x + i * 6, y, c)  # Move 6 pixels to the right for each character (5 for width + 1 for spacing)
-                 
+
+    def sprint_buf(self, buf, n, x, y, c=1):
+        """Like sprint, for the first n bytes of an ASCII bytearray, without allocating."""
+        for i in range(n):
+            glyph = _GLYPHS[buf[i] & 0x7F]
+            if glyph is not None:
+                self._draw_glyph(glyph, x + i * 6, y, c)
+
     # Helper function to determine if a point is inside a triangle
     def point_in_triangle(self, px, py, x0, y0, x1, y1, x2, y2):
         dX = px - x2
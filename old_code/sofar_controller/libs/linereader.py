@@ -0,0 +1,135 @@
+import time
+import binframe
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+_CR = const(13)
+_LF = const(10)
+
+
+class LineReader:
+    """
+    Reads CR/LF terminated frames from a UART into a preallocated buffer.
+
+    readline() hands back a memoryview into the buffer, so no bytes are
+    allocated per received byte or per frame. The view is only valid until
+    the next call, copy it if it has to outlive that.
+
+    read_frame() also recognises binary frames, which start with
+    binframe.SYNC and are delimited by their length field instead of CR/LF.
+    """
+
+    def __init__(self, uart, size=256, idle_ms=5):
+        self.uart = uart
+        self.idle_ms = idle_ms
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.start = 0 # first unconsumed byte
+        self.scan = 0 # bytes before this have been checked for a terminator
+        self.end = 0 # end of received data
+        self.overflows = 0
+        self.bad_frames = 0
+
+    def reset(self):
+        self.start = self.scan = self.end = 0
+
+    def _find_terminator(self):
+        buf = self.buf
+        for i in range(self.scan, self.end):
+            c = buf[i]
+            if c == _LF or c == _CR:
+                return i
+        self.scan = self.end
+        return -1
+
+    def _compact(self):
+        n = self.end - self.start
+        if n:
+            self.mv[0:n] = self.mv[self.start:self.end]
+        self.scan -= self.start
+        self.start = 0
+        self.end = n
+
+    def _fill(self):
+        if self.end == len(self.buf):
+            if self.start == 0:
+                # a frame longer than the buffer can never complete, drop it
+                self.overflows += 1
+                self.start = self.scan = self.end = 0
+            else:
+                self._compact()
+
+        if not self.uart.any():
+            return 0
+
+        n = self.uart.readinto(self.mv[self.end:])
+        if n:
+            self.end += n
+            return n
+        return 0
+
+    def _take(self, end, skip):
+        frame = self.mv[self.start:end]
+        self.start = self.scan = end + skip
+        if self.start == self.end:
+            self.start = self.scan = self.end = 0
+        return frame
+
+    def read_frame(self):
+        """Return (is_binary, frame) for the next complete frame, or None after idling if there is none yet."""
+        frame = self.poll_frame()
+        if frame is None:
+            time.sleep_ms(self.idle_ms)
+        return frame
+
+    async def read_frame_async(self):
+        """Wait for the next complete frame, yielding to other tasks while the UART is idle."""
+        while True:
+            frame = self.poll_frame()
+            if frame is not None:
+                return frame
+            await asyncio.sleep_ms(self.idle_ms)
+
+    def poll_frame(self):
+        """Return (is_binary, frame) for the next complete frame, or None right away if there is none yet."""
+        buf = self.buf
+        while True:
+            if self.start < self.end and buf[self.start] == binframe.SYNC:
+                available = self.end - self.start
+                if available >= binframe.HEADER_SIZE:
+                    length = binframe.frame_length(buf, self.start)
+                    if length < 0 or length > len(buf):
+                        # can't be a frame we can hold, resync on the next byte
+                        self.bad_frames += 1
+                        self.start += 1
+                        self.scan = self.start
+                        continue
+                    if available >= length:
+                        return True, self._take(self.start + length, 0)
+            else:
+                i = self._find_terminator()
+                if i >= 0:
+                    line = self._take(i, 1)
+                    if len(line):
+                        return False, line
+                    continue # empty frame, e.g. the LF of a CRLF pair
+
+            if not self._fill():
+                return None
+
+    def readline(self):
+        """Return the next complete text frame without its terminator, or None if there is none yet."""
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return None
+            if not frame[0]:
+                return frame[1]
+
+    def lines(self):
+        while True:
+            line = self.readline()
+            if line is not None:
+                yield line
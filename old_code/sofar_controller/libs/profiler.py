@@ -0,0 +1,113 @@
+from array import array
+import gc
+import time
+
+# quarter octave buckets of us: 0-3 exactly, then 4 per doubling up to ~30 s
+OCTAVES = 22
+BUCKETS = 4 + 4 * OCTAVES
+
+
+def _bucket(us):
+    if us < 4:
+        return us
+    octave = 0
+    while us >= 8:
+        us >>= 1
+        octave += 1
+    return min(4 + octave * 4 + us - 4, BUCKETS - 1)
+
+
+def _upper_bound(bucket):
+    if bucket < 4:
+        return bucket + 1
+    octave, step = divmod(bucket - 4, 4)
+    return (step + 5) << octave
+
+
+class Stage:
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.hist = array("L", [0] * BUCKETS)
+
+    def add(self, us):
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+        self.hist[_bucket(us)] += 1
+
+    def percentile(self, p):
+        """Upper bound in us of the bucket holding the p-th percentile, within 25%."""
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for bucket in range(BUCKETS):
+            seen += self.hist[bucket]
+            if seen >= target:
+                return min(_upper_bound(bucket), self.max_us)
+        return self.max_us
+
+    def format(self):
+        mean = self.total_us // self.count if self.count else 0
+        return f"{self.count},{mean},{self.percentile(50)},{self.percentile(90)},{self.percentile(99)},{self.max_us}"
+
+
+class Profiler:
+    """
+    Cheap timing spans and memory tracking for the firmware loops.
+
+    Each span costs two ticks_us calls and a few integer operations, the
+    percentiles come from a fixed histogram so nothing grows with the
+    number of samples.
+    """
+
+    def __init__(self, mem_samples=16):
+        self.stages = {}
+        self.mem = array("L", [0] * mem_samples)
+        self.mem_count = 0
+        self.mem_interval_ms = 0
+        self.mem_last_ms = time.ticks_ms()
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Stage()
+        return self.stages[name]
+
+    def start(self):
+        return time.ticks_us()
+
+    def end(self, name, start):
+        self.stage(name).add(time.ticks_diff(time.ticks_us(), start))
+
+    def sample_mem(self):
+        now = time.ticks_ms()
+        self.mem_interval_ms = time.ticks_diff(now, self.mem_last_ms)
+        self.mem_last_ms = now
+        self.mem[self.mem_count % len(self.mem)] = gc.mem_free()
+        self.mem_count += 1
+
+    def mem_trend(self):
+        """Return (free now, lowest free seen in the window, change in bytes per second)."""
+        n = min(self.mem_count, len(self.mem))
+        if not n:
+            return 0, 0, 0
+        newest = self.mem[(self.mem_count - 1) % len(self.mem)]
+        oldest = self.mem[(self.mem_count - n) % len(self.mem)]
+        lowest = min(self.mem[i] for i in range(n))
+        span_s = (n - 1) * self.mem_interval_ms / 1000
+        trend = (newest - oldest) / span_s if span_s else 0
+        return newest, lowest, trend
+
+    def reset(self):
+        self.stages = {}
+
+    def format(self, counters):
+        """name:count,mean,p50,p90,p99,max|...|mem:free,min,bytes_per_s|name=value,..."""
+        parts = [f"{name}:{stage.format()}" for name, stage in self.stages.items()]
+        free, lowest, trend = self.mem_trend()
+        parts.append(f"mem:{free},{lowest},{trend:.0f}")
+        parts.append(",".join(f"{name}={value}" for name, value in counters.items()))
+        return "|".join(parts)
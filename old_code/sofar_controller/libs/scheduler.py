@@ -0,0 +1,147 @@
+import time
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class Job:
+    def __init__(self, name, fn, rate_hz, deadline_ms=None):
+        self.name = name
+        self.fn = fn
+        self.set_rate(rate_hz, deadline_ms)
+        self.next_due = time.ticks_ms()
+        self.reset_stats()
+
+    def set_rate(self, rate_hz, deadline_ms=None):
+        if rate_hz <= 0:
+            raise ValueError(f"Invalid rate for {self.name}: {rate_hz}")
+        self.rate_hz = rate_hz
+        self.period_ms = max(1, int(1000 / rate_hz))
+        # default deadline is the full period, a job must finish before its next slot
+        self.deadline_ms = deadline_ms if deadline_ms is not None else self.period_ms
+
+    def reset_stats(self):
+        self.runs = 0
+        self.overruns = 0
+        self.jitter_sum = 0
+        self.jitter_max = 0
+        self.first_run = None
+        self.last_run = None
+
+    def achieved_rate(self):
+        if self.runs < 2:
+            return 0.0
+        elapsed = time.ticks_diff(self.last_run, self.first_run)
+        if elapsed <= 0:
+            return 0.0
+        return (self.runs - 1) * 1000 / elapsed
+
+    def stats(self):
+        jitter_avg = self.jitter_sum / self.runs if self.runs else 0
+        return f"{self.name}={self.achieved_rate():.2f}/{self.rate_hz}Hz,j{jitter_avg:.0f}/{self.jitter_max}ms,o{self.overruns}"
+
+
+class Scheduler:
+    """
+    Runs jobs at fixed rates from a single thread and sleeps in between,
+    either as a blocking loop (run) or as an asyncio task (run_async).
+
+    Each job is run when it becomes due. Jitter is how late a job started
+    relative to its slot, an overrun is a job that took longer than its
+    deadline or a slot that had to be skipped because the job fell behind.
+    """
+
+    def __init__(self, max_sleep_ms=100):
+        self.jobs = {}
+        # cap the sleep so rate changes from other threads take effect quickly
+        self.max_sleep_ms = max_sleep_ms
+
+    def add(self, name, fn, rate_hz, deadline_ms=None):
+        job = Job(name, fn, rate_hz, deadline_ms)
+        # swap in a new dict so the scheduler thread never sees one being resized
+        jobs = dict(self.jobs)
+        jobs[name] = job
+        self.jobs = jobs
+        return job
+
+    def remove(self, name):
+        jobs = dict(self.jobs)
+        jobs.pop(name, None)
+        self.jobs = jobs
+
+    def set_rate(self, name, rate_hz, deadline_ms=None):
+        if name not in self.jobs:
+            raise ValueError(f"Invalid job name: {name}")
+        job = self.jobs[name]
+        job.set_rate(rate_hz, deadline_ms)
+        job.reset_stats()
+        job.next_due = time.ticks_ms()
+
+    def _next_job(self):
+        next_job = None
+        for job in self.jobs.values():
+            if next_job is None or time.ticks_diff(job.next_due, next_job.next_due) < 0:
+                next_job = job
+        return next_job
+
+    def _due(self):
+        """Return (job, 0) if a job is due, else (None, ms to sleep before looking again)."""
+        job = self._next_job()
+        if job is None:
+            return None, self.max_sleep_ms
+
+        wait = time.ticks_diff(job.next_due, time.ticks_ms())
+        if wait > 0:
+            return None, min(wait, self.max_sleep_ms)
+        return job, 0
+
+    def _finished(self, job, start, end):
+        jitter = time.ticks_diff(start, job.next_due)
+        job.runs += 1
+        job.jitter_sum += jitter
+        if jitter > job.jitter_max:
+            job.jitter_max = jitter
+        if job.first_run is None:
+            job.first_run = start
+        job.last_run = start
+
+        if time.ticks_diff(end, start) > job.deadline_ms:
+            job.overruns += 1
+
+        job.next_due = time.ticks_add(job.next_due, job.period_ms)
+        if time.ticks_diff(end, job.next_due) > 0:
+            # fell a whole period behind, skip the missed slots instead of bursting
+            job.overruns += 1
+            job.next_due = time.ticks_add(end, job.period_ms)
+
+    def run_once(self):
+        job, wait = self._due()
+        if job is None:
+            time.sleep_ms(wait)
+            return
+
+        start = time.ticks_ms()
+        job.fn()
+        self._finished(job, start, time.ticks_ms())
+
+    def run(self):
+        while True:
+            self.run_once()
+
+    async def run_async(self):
+        """Run the jobs as an asyncio task, a job may also be a coroutine function."""
+        while True:
+            job, wait = self._due()
+            if job is None:
+                await asyncio.sleep_ms(wait)
+                continue
+
+            start = time.ticks_ms()
+            result = job.fn()
+            if result is not None:
+                await result
+            self._finished(job, start, time.ticks_ms())
+
+    def stats(self):
+        return " ".join(job.stats() for job in self.jobs.values())
@@ -0,0 +1,91 @@
+from textbuf import TextBuffer, to_fixed
+
+_OPEN = b"Solenoid Open"
+_CLOSED = b"Solenoid Closed"
+
+
+class StatusScreen:
+    """
+    The status page main.py shows, drawn from preallocated text lines.
+
+    A line is only rebuilt when one of its values is a different object than
+    in the last frame, and the LED is only written when the solenoid state
+    changes. Frames in between allocate nothing, so the UI does not feed the
+    GC that would otherwise pause the sensor and UART tasks. update() tells
+    whether anything changed, so unchanged frames need not be drawn at all.
+    """
+
+    def __init__(self, iface, address):
+        self.iface = iface
+        self.header = TextBuffer().add(b"Device Address: ").add(address.encode())
+        self.inner = TextBuffer()
+        self.outer = TextBuffer()
+        self.last_from = TextBuffer()
+        self.last_msg = TextBuffer()
+        self.age = TextBuffer()
+        self._solenoid = None
+        self._t_inner = self._p_inner = None
+        self._t_outer = self._p_outer = None
+        self._from = self._command = self._args = None
+        self._age = None
+
+    @staticmethod
+    def _sensor_line(line, label, t, p):
+        line.clear().add(label).add_fixed(to_fixed(t, 1), 1).add(b"C ").add_fixed(to_fixed(p, 2), 2).add(b"hPa")
+
+    def update(self, solenoid_open, t_inner, p_inner, t_outer, p_outer, commands, now_s):
+        """Rebuild the lines whose values changed, now_s is time.time(). Returns True if any did."""
+        changed = solenoid_open != self._solenoid
+        if changed:
+            self._solenoid = solenoid_open
+            if solenoid_open:
+                self.iface.set_led(G=1)
+            else:
+                self.iface.set_led(R=1)
+
+        if t_inner is not self._t_inner or p_inner is not self._p_inner:
+            self._t_inner = t_inner
+            self._p_inner = p_inner
+            self._sensor_line(self.inner, b"I: ", t_inner, p_inner)
+            changed = True
+
+        if t_outer is not self._t_outer or p_outer is not self._p_outer:
+            self._t_outer = t_outer
+            self._p_outer = p_outer
+            self._sensor_line(self.outer, b"O: ", t_outer, p_outer)
+            changed = True
+
+        if commands.last_from is not self._from:
+            self._from = commands.last_from
+            self.last_from.clear().add(b"last msg from: ").add(self._from.encode())
+            changed = True
+
+        if commands.last_command is not self._command or commands.last_args is not self._args:
+            self._command = commands.last_command
+            self._args = commands.last_args
+            self.last_msg.clear().add(self._command.encode()).add(b" ").add(self._args.encode())
+            changed = True
+
+        age = int(now_s - commands.last_received)
+        if age != self._age:
+            self._age = age
+            self.age.clear().add_int(age).add(b" s ago")
+            changed = True
+        return changed
+
+    def _line(self, line, y):
+        self.iface.sprint_buf(line.buf, line.n, 0, y)
+
+    def render(self):
+        iface = self.iface
+        iface.clear(0)
+        self._line(self.header, 0)
+
+        text = _OPEN if self._solenoid else _CLOSED
+        iface.sprint_buf(text, len(text), 0, 9)
+
+        self._line(self.inner, 18)
+        self._line(self.outer, 27)
+        self._line(self.last_from, 39)
+        self._line(self.last_msg, 47)
+        self._line(self.age, 58)
@@ -0,0 +1,58 @@
+import time
+from history import SampleHistory
+
+
+class Subscription:
+    """
+    Pushes samples to the master at a subscribed rate.
+
+    In free running mode every sample is written as soon as it is taken.
+    In token mode samples are queued and only sent when the master hands
+    this device the token, so several devices can stream on one bus
+    without talking over each other. Either way each sample is sent once,
+    as 's|now|seq,ms,ti,pi,to,po|...'.
+
+    The stream sends the latest readings, raise the sensor job rates as
+    well to get new values at higher stream rates.
+    """
+
+    JOB = "stream"
+
+    def __init__(self, scheduler, sample, write, size=64, max_reply=32):
+        self.scheduler = scheduler
+        self.sample = sample # returns (ms, t_inner, p_inner, t_outer, p_outer)
+        self.write = write
+        self.buffer = SampleHistory(size)
+        self.max_reply = max_reply
+        self.active = False
+        self.token = False
+        self.cursor = 0
+        self.dropped = 0
+
+    def start(self, rate_hz, token=False):
+        # add replaces a running job, but only once the rate is valid
+        self.scheduler.add(self.JOB, self._take_sample, rate_hz)
+        self.token = token
+        self.cursor = self.buffer.next_seq
+        self.active = True
+
+    def stop(self):
+        self.scheduler.remove(self.JOB)
+        self.active = False
+
+    def _take_sample(self):
+        self.buffer.append(*self.sample())
+        if not self.token:
+            self.write(self.pending())
+
+    def pending(self):
+        """Format everything not yet sent and move the cursor past it."""
+        oldest = self.buffer.oldest_seq()
+        if self.cursor < oldest:
+            # the master did not pass the token often enough to keep up
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+        samples = self.buffer.since(self.cursor, self.max_reply)
+        if samples:
+            self.cursor = samples[-1][0] + 1
+        return "s|" + SampleHistory.format(samples, time.ticks_ms())
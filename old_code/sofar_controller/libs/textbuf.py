@@ -0,0 +1,79 @@
+_MINUS = const(45)
+_DOT = const(46)
+_ZERO = const(48)
+_SPACE = const(32)
+
+
+class TextBuffer:
+    """
+    A line of ASCII text built in place in a preallocated bytearray.
+
+    Numbers are written digit by digit with integer math, so rebuilding a
+    line allocates nothing. Text that does not fit is cut off.
+    """
+
+    def __init__(self, size=21):
+        self.buf = bytearray(size)
+        self.n = 0
+
+    def clear(self):
+        self.n = 0
+        return self
+
+    def _put(self, byte):
+        if self.n < len(self.buf):
+            self.buf[self.n] = byte
+            self.n += 1
+
+    def add(self, data):
+        """Append bytes, or a bytearray/memoryview of ASCII text."""
+        for i in range(len(data)):
+            self._put(data[i])
+        return self
+
+    def add_int(self, value, width=0):
+        """Append an integer, right aligned to width with spaces."""
+        negative = value < 0
+        if negative:
+            value = -value
+        digits = 1
+        scale = 1
+        while value >= scale * 10:
+            scale *= 10
+            digits += 1
+        pad = width - digits - negative
+        while pad > 0:
+            self._put(_SPACE)
+            pad -= 1
+        if negative:
+            self._put(_MINUS)
+        while scale:
+            self._put(_ZERO + value // scale % 10)
+            scale //= 10
+        return self
+
+    def add_fixed(self, value, decimals):
+        """Append a fixed point number, value is the number scaled by 10**decimals."""
+        if value < 0:
+            self._put(_MINUS)
+            value = -value
+        scale = 1
+        for _ in range(decimals):
+            scale *= 10
+        self.add_int(value // scale)
+        if decimals:
+            self._put(_DOT)
+            scale //= 10
+            while scale:
+                self._put(_ZERO + value // scale % 10)
+                scale //= 10
+        return self
+
+    def __len__(self):
+        return self.n
+
+
+def to_fixed(value, decimals):
+    """Round a float to the scaled integer add_fixed expects."""
+    scale = 10 ** decimals
+    return int(value * scale + 0.5) if value >= 0 else -int(-value * scale + 0.5)
@@ -0,0 +1,125 @@
+import matplotlib.dates as mdates
+
+from plot_history import PlotHistory, lttb
+
+# (label, axes index, color) in the order of a read reply and the csv columns
+SERIES = (
+    ("Temperature1", 0, "blue"),
+    ("Pressure1", 1, "blue"),
+    ("Temperature2", 0, "red"),
+    ("Pressure2", 1, "red"),
+    )
+YLABELS = ("Temperature (°C)", "Pressure (hPa)")
+
+
+class LivePlot:
+    """
+    Temperature and pressure plot that only draws what changed.
+
+    The lines are persistent artists. A new sample is drawn as one segment
+    per line on top of a saved copy of the canvas (blitting), and the copy
+    is taken again afterwards, so the cost of a sample does not depend on
+    how much is already plotted. Only a sample outside the current limits
+    widens them, with headroom so this stays rare, and redraws the figure
+    in full. The x axis holds matplotlib date numbers, not strings.
+
+    Samples are kept in a PlotHistory, so memory stays flat, and full draws
+    show the whole session downsampled with LTTB to points_per_pixel points
+    per pixel of axes width, so they stay cheap too.
+
+    drawstyle is passed on to the lines, "steps-post" shows readings that
+    hold until the next one, as a deadband recorder keeps them.
+    """
+
+    def __init__(self, fig, axes, ylims=((15, 30), (400, 1300)), x_span_s=600, headroom=0.5,
+                 history=None, points_per_pixel=1, drawstyle="default"):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.axes = axes
+        self.min_x_span = x_span_s / 86400
+        self.headroom = headroom
+        self.points_per_pixel = points_per_pixel
+        # column 0 is x, then SERIES
+        self.history = history if history is not None else PlotHistory(1 + len(SERIES))
+        self.lines = []
+        self.tails = []
+        for label, axis, color in SERIES:
+            ax = axes[axis]
+            self.lines.append(ax.plot([], [], label=label, color=color, drawstyle=drawstyle)[0])
+            # just the newest segment, drawn by hand onto the saved background
+            self.tails.append(ax.plot([], [], color=color, drawstyle=drawstyle, animated=True)[0])
+
+        for ax, ylim, ylabel in zip(axes, ylims, YLABELS):
+            ax.set_ylim(*ylim)
+            ax.set_ylabel(ylabel)
+            ax.legend(loc='upper left')
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        axes[-1].set_xlabel('Time')
+
+        self.background = None
+        self.synced = 0 # samples the full lines hold
+        self.full_draws = 0
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        # any full draw, ours or a window resize, must show every sample before the copy
+        if self.synced != len(self.history):
+            self._sync_lines()
+            for line in self.lines:
+                line.axes.draw_artist(line)
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def _sync_lines(self):
+        session = self.history.session()
+        x = session[:, 0]
+        for column, line in enumerate(self.lines, 1):
+            budget = int(line.axes.bbox.width * self.points_per_pixel)
+            keep = lttb(x, session[:, column], budget)
+            line.set_data(x[keep], session[keep, column])
+        self.synced = len(session)
+
+    def _fits(self, x, values):
+        xmin, xmax = self.axes[0].get_xlim()
+        if not xmin <= x <= xmax:
+            return False
+        for (label, axis, color), value in zip(SERIES, values):
+            low, high = self.axes[axis].get_ylim()
+            if not low <= value <= high:
+                return False
+        return True
+
+    def _rescale(self):
+        history = self.history
+        x0 = history.first()[0]
+        span = max(self.min_x_span, (history.high[0] - x0) * (1 + self.headroom))
+        for axis, ax in enumerate(self.axes):
+            ax.set_xlim(x0, x0 + span)
+            columns = [column for column, (label, a, color) in enumerate(SERIES, 1) if a == axis]
+            low, high = ax.get_ylim()
+            low_data, high_data = history.low[columns].min(), history.high[columns].max()
+            if low_data < low or high_data > high:
+                pad = (max(high, high_data) - min(low, low_data)) * self.headroom / 2
+                ax.set_ylim(min(low, low_data - pad), max(high, high_data + pad))
+        self._sync_lines()
+        self.canvas.draw()
+        self.full_draws += 1
+
+    def add(self, when, values):
+        """Plot one sample, when is a datetime and values are in SERIES order."""
+        x = mdates.date2num(when)
+        self.history.append((x, *values))
+
+        if self.background is None or not self._fits(x, values):
+            self._rescale()
+        elif len(self.history) > 1:
+            segment = self.history.last(2)
+            for column, tail in enumerate(self.tails, 1):
+                tail.set_data(segment[:, 0], segment[:, column])
+            self.canvas.restore_region(self.background)
+            for tail in self.tails:
+                tail.axes.draw_artist(tail)
+            self.canvas.blit(self.fig.bbox)
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.canvas.flush_events()
@@ -0,0 +1,80 @@
+"""
+Write and reload cost of the plotter's csv versus the column log.
+
+Writes the same synthetic session both ways, csv the way data_plotter.py
+used to (writerow and flush per sample) and through ColumnLog, then loads
+both back into columns.
+python log_bench.py [--rows 100000]
+"""
+import argparse
+import csv
+import datetime
+import os
+import tempfile
+import time
+
+from columnlog import ColumnLog, read_log
+
+START = datetime.datetime(2024, 8, 29, 17, 35, 16)
+
+
+def reading(i):
+    return (22.1 + i % 10 * 0.1, 1015.73 - i % 7 * 0.01, 23.8, 1015.38)
+
+
+def write_csv(path, rows):
+    with open(path, 'a', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(['Timestamp', 'Temperature1', 'Pressure1', 'Temperature2', 'Pressure2'])
+        for i in range(rows):
+            timestamp = (START + datetime.timedelta(seconds=i)).strftime("%Y-%m-%d\n%H:%M:%S")
+            csv_writer.writerow([timestamp, *reading(i)])
+            csv_file.flush()
+
+
+def load_csv(path):
+    columns = [[] for _ in range(5)]
+    with open(path, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        for row in reader:
+            columns[0].append(datetime.datetime.strptime(row[0], "%Y-%m-%d\n%H:%M:%S").timestamp())
+            for column, value in zip(columns[1:], row[1:]):
+                column.append(float(value))
+    return columns
+
+
+def write_log(path, rows):
+    log = ColumnLog(path)
+    start = START.timestamp()
+    for i in range(rows):
+        log.append(start + i, 2, reading(i))
+    log.close()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare csv and column log write and load times")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "session.csv")
+        log_path = os.path.join(directory, "session.col")
+        csv_write = timed(write_csv, csv_path, args.rows)
+        log_write = timed(write_log, log_path, args.rows)
+        csv_load = timed(load_csv, csv_path)
+        log_load = timed(read_log, log_path)
+        print(f"{args.rows} rows")
+        print(f"write: csv {csv_write:.2f} s ({os.path.getsize(csv_path)} B), "
+              f"column log {log_write:.2f} s ({os.path.getsize(log_path)} B)")
+        print(f"load:  csv {csv_load:.2f} s, column log {log_load * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,25 @@ import ssd1306
 import time
 from interface import InterfaceBoard
 from bmp390 import BMP390
-import _thread
-import re
+from scheduler import Scheduler
+from history import SampleHistory
+import aggregate
+from aggregate import AggregateTiers
+from flashlog import FlashLog
+from linereader import LineReader
+from dispatch import CommandTable
+from stream import Subscription
+from capture import CaptureSlots
+from baudlink import BaudNegotiator
+from profiler import Profiler
+from statusscreen import StatusScreen
+from framepacer import FramePacer
+import binframe
+import struct
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 # Version
 VERSION = "0.1.0"
@@ -20,11 +37,13 @@ def solenoid_on():
     global solenoid_state
     solenoid_pin.value(1)
     solenoid_state = True
+    ui_pacer.wake()
     
 def solenoid_off():
     global solenoid_state
     solenoid_pin.value(0)
     solenoid_state = False
+    ui_pacer.wake()
 
 # Define I2C bus
 i2c = I2C(0, scl=Pin(7), sda=Pin(6))
@@ -36,154 +55,386 @@ bmp_inner = BMP390(i2c, address=0x76)
 # Initialize Interface Board
 iface = InterfaceBoard(i2c)
 
-# setup the sensor polling thread
+# the display is only redrawn when something changed, at most UI_FPS times a second
+UI_FPS = 10
+UI_IDLE_HZ = 1 # the "s ago" counter still ticks when nothing else happens
+ui_pacer = FramePacer(UI_FPS)
+
+# timing spans for the sensor, UART and UI loops, dumped by the stats command
+profiler = Profiler()
+MEM_SAMPLE_HZ = 0.2
+
+# setup the sensor polling task
 t_inner = -1
 p_inner = -1
 t_outer = -1
 p_outer = -1
+inner_ms = time.ticks_ms() # when each sensor was last read
+outer_ms = time.ticks_ms()
+
+# each sensor gets one conversion per job, pressure and temperature come from the same read
+SENSOR_RATE_HZ = 2
+SENSOR_DEADLINE_MS = 250
+
+# min/max/mean buckets of every raw reading for long soak tests
+AGG_MAX_REPLY = 8 # buckets per reply frame
+
+aggregates = AggregateTiers()
 
-def update_sensors():
+# captures read the sensors outside their jobs, one conversion per sensor at a time
+outer_lock = asyncio.Lock()
+inner_lock = asyncio.Lock()
+
+async def read_outer():
     global t_outer
     global p_outer
+    global outer_ms
+    async with outer_lock:
+        start = profiler.start()
+        p_outer, t_outer = await bmp_outer.read_async()
+        profiler.end("outer", start)
+        now = outer_ms = time.ticks_ms()
+    aggregates.update(now, aggregate.T_OUTER, t_outer)
+    aggregates.update(now, aggregate.P_OUTER, p_outer)
+    record_sample(OUTER_FRESH)
+    ui_pacer.wake()
+
+async def read_inner():
     global t_inner
     global p_inner
-    
-    sensor_to_update = 0
-    
-    while True:
-        if sensor_to_update==0:
-            t_outer = bmp_outer.temperature
-        if sensor_to_update==1:
-            p_outer = bmp_outer.pressure
-        if sensor_to_update==2:
-            t_inner = bmp_inner.temperature
-        if sensor_to_update==3:
-            p_inner = bmp_inner.pressure
-            
-        sensor_to_update += 1
-        if sensor_to_update==4:
-            sensor_to_update=0
-
-_thread.start_new_thread(update_sensors, ())
+    global inner_ms
+    async with inner_lock:
+        start = profiler.start()
+        p_inner, t_inner = await bmp_inner.read_async()
+        profiler.end("inner", start)
+        now = inner_ms = time.ticks_ms()
+    aggregates.update(now, aggregate.T_INNER, t_inner)
+    aggregates.update(now, aggregate.P_INNER, p_inner)
+    record_sample(INNER_FRESH)
+    ui_pacer.wake()
+
+# sample history, the host can fetch what it missed between polls
+HISTORY_SIZE = 512
+HISTORY_MAX_REPLY = 32 # samples per reply frame
+
+history = SampleHistory(HISTORY_SIZE)
+
+# binary sample log on flash so nothing is lost while the master is disconnected
+FLASH_LOG_ENABLED = False
+FLASH_DUMP_CHUNK = 576 # bytes per download frame, a whole number of records
+
+flash_log = FlashLog()
+flash_log.enabled = FLASH_LOG_ENABLED
+
+# a sample is recorded for every pair of fresh readings, so it follows the sensor rate
+INNER_FRESH = 1
+OUTER_FRESH = 2
+fresh = 0
+
+def record_sample(sensor):
+    global fresh
+    fresh |= sensor
+    if fresh != INNER_FRESH | OUTER_FRESH:
+        return
+    fresh = 0
+    # stamped when the pair was complete, the later of the two conversions
+    ms = inner_ms if time.ticks_diff(inner_ms, outer_ms) > 0 else outer_ms
+    seq = history.next_seq
+    history.append(ms, t_inner, p_inner, t_outer, p_outer)
+    flash_log.append(seq, ms, t_inner, p_inner, t_outer, p_outer)
+
+scheduler = Scheduler()
+scheduler.add("outer", read_outer, SENSOR_RATE_HZ, SENSOR_DEADLINE_MS)
+scheduler.add("inner", read_inner, SENSOR_RATE_HZ, SENSOR_DEADLINE_MS)
+scheduler.add("mem", profiler.sample_mem, MEM_SAMPLE_HZ)
+scheduler.add("ui", ui_pacer.wake, UI_IDLE_HZ)
 
 # Initialize UART for RS485
 # UART(id, baudrate=115200, bits=8, parity=None, stop=1, tx=None, rx=None)
-uart = UART(1, baudrate=115200, tx=Pin(21), rx=Pin(20))
+UART_BAUD = 115200 # the rate after every boot, faster rates are negotiated at runtime
+UART_TXBUF = 1024 # a whole dump frame fits, so writing one never blocks the loop
+UART_TX_POLL_MS = 2
+uart = UART(1, baudrate=UART_BAUD, tx=Pin(21), rx=Pin(20), txbuf=UART_TXBUF)
 
 
 # setup the UART message handling
 DEVICE_ADDRESS = "02"
+BROADCAST_ADDRESS = "99" # every device listens, nobody replies
 
-last_msg = "Waiting for 1st msg"
-# Regular expression pattern to match the command format
-pattern = re.compile(r"(\d\d):(\d\d):(.*)")
+line_reader = LineReader(uart)
+DEVICE_ADDRESS_BYTES = DEVICE_ADDRESS.encode("ascii")
+BROADCAST_ADDRESS_BYTES = BROADCAST_ADDRESS.encode("ascii")
 
-def listen_for_uart():
-    buffer = ""
+def set_baud(rate):
+    uart.flush() # let the ack go out at the old rate
+    uart.init(baudrate=rate, tx=Pin(21), rx=Pin(20), txbuf=UART_TXBUF)
+    line_reader.reset() # whatever is buffered was received at the old rate
+
+baud = BaudNegotiator(set_baud, UART_BAUD)
+
+# every task runs on the one event loop, so replies and stream pushes never interleave
+commands = CommandTable(DEVICE_ADDRESS, uart.write, BROADCAST_ADDRESS)
+respond = commands.respond
+
+def current_sample():
+    return time.ticks_ms(), t_inner, p_inner, t_outer, p_outer
+
+subscription = Subscription(scheduler, current_sample, respond)
+
+def handle_frame(is_binary, line):
+    # cheap address check before anything gets allocated for frames meant for other devices
+    if is_binary:
+        baud.after_frame(line[1] == commands.address_id and commands.dispatch_binary(line))
+    elif len(line) < 6:
+        return
+    elif line[0] == DEVICE_ADDRESS_BYTES[0] and line[1] == DEVICE_ADDRESS_BYTES[1]:
+        baud.after_frame(commands.dispatch(line))
+    elif line[0] == BROADCAST_ADDRESS_BYTES[0] and line[1] == BROADCAST_ADDRESS_BYTES[1]:
+        commands.dispatch(line)
+
+async def uart_task():
     while True:
-        if uart.any():
-            char = uart.read(1).decode("ascii")
-            buffer += char
-            
-            if buffer.endswith("\n") or buffer.endswith("\r"):
-                buffer.strip()
-                match = pattern.match(buffer)
-                if match:
-                    to_address = match.group(1)                
-                    if to_address == DEVICE_ADDRESS:
-                        handle_message(match.group(0))
-                buffer = ""  # Reset the buffer after processing the message
-
-def respond(msg):
-    uart.write(f"00:{DEVICE_ADDRESS}:{msg}\r\n")
-
-last_received = time.time()
-last_from = "None"
-
-def handle_message(message):
-    global last_received
-    global last_msg
-    global last_from
-    
-    last_received = time.time()
+        baud.poll()
+        frame = line_reader.poll_frame()
+        if frame is None:
+            await asyncio.sleep_ms(line_reader.idle_ms)
+            continue
+        start = profiler.start()
+        try:
+            handle_frame(*frame)
+        except Exception as e:
+            # a bad handler must not take the link down with it
+            print(f"Error handling frame: {e}")
+        profiler.end("msg", start)
+        ui_pacer.wake()
+        await asyncio.sleep_ms(0)
 
-    match = pattern.match(message)
-    if not match:
-        return  # If the message doesn't match the pattern, ignore it
+def cmd_read(args):
+    return f"{t_inner:.1f},{p_inner:.2f},{t_outer:.1f},{p_outer:.2f}"
 
-    to_address = match.group(1)
-    from_address = match.group(2)
-    last_from = from_address
-    command = match.group(3).strip()
+def cmd_open(args):
+    solenoid_on()
+    return "opened"
 
-    last_msg = command
-        
-    print(f"from '{from_address}' to '{to_address}': '{command}'")
-    
-    # React to the received command
-    if command == "read":
-        respond(f"{t_inner:.1f},{p_inner:.2f},{t_outer:.1f},{p_outer:.2f}")
-        
-    elif command == "open":
-        solenoid_on()
-        respond("opened")
-        
-    elif command == "close":
-        solenoid_off()
-        respond("closed")
-        
-    elif command == "ping":
-        respond("pong")
-
-    elif command == "version":
-        respond(f"{VERSION}")
-
-    elif command == "device":
-        respond(f"{DEVICE_TYPE}")
-    else:
-        respond("?")
+def cmd_close(args):
+    solenoid_off()
+    return "closed"
 
-# Start a new thread for listening to UART messages
-_thread.start_new_thread(listen_for_uart, ())
+def cmd_sched(args):
+    return scheduler.stats()
 
+def cmd_rate(args):
+    # rate <job> <hz> [deadline_ms]
+    args = args.split()
+    deadline_ms = int(args[2]) if len(args) > 2 else None
+    scheduler.set_rate(args[0], float(args[1]), deadline_ms)
+    return "ok"
 
+def cmd_hist(args):
+    # hist <n>: the newest n samples
+    n = min(int(args), HISTORY_MAX_REPLY)
+    return SampleHistory.format(history.last(n), time.ticks_ms())
 
+def cmd_since(args):
+    # since <seq>: samples from seq onwards, ask again from the last seq + 1 for more
+    samples = history.since(int(args), HISTORY_MAX_REPLY)
+    return SampleHistory.format(samples, time.ticks_ms())
 
-while True:
-    iface.clear(0)
-    
-    iface.sprint(f"Device Address: {DEVICE_ADDRESS}", 0,0,1)
-    
-    if iface.get_btn("B1"):
-        solenoid_state = True
-        
-    if iface.get_btn("B2"):
-        solenoid_state = False
-        
-    if solenoid_state:
-        iface.set_led(G=1)
-        iface.sprint("Solenoid Open", 0,9,1)
+def cmd_agg(args):
+    # agg <tier> <n> [skip]: newest n closed buckets of a tier, skip pages further back
+    args = args.split()
+    skip = int(args[2]) if len(args) > 2 else 0
+    buckets = aggregates.query(int(args[0]), min(int(args[1]), AGG_MAX_REPLY), skip)
+    return AggregateTiers.format(buckets, time.ticks_ms())
+
+def cmd_log(args):
+    # log on|off
+    if args == "on":
+        flash_log.enabled = True
+    elif args == "off":
+        flash_log.flush()
+        flash_log.enabled = False
     else:
-        iface.set_led(R=1)
-        iface.sprint("Solenoid Closed", 0,9,1)
-        
-    solenoid_pin.value(solenoid_state)
-    
-    # printout the inner sensor
-    iface.sprint(f"I: {t_inner:.1f}C {p_inner:.2f}hPa", 0, 18)
-    # printout the outer sensor
-    iface.sprint(f"O: {t_outer:.1f}C {p_outer:.2f}hPa", 0, 27)
-    
-    # printout the last command
-    iface.sprint(f"last msg from: {last_from}", 0, 39)
-    iface.sprint(f"{last_msg}", 0, 47)
-    iface.sprint(f"{time.time() - last_received} s ago", 0, 58)
-    
-    
-    
-    iface.show()
-    
-    
-    time.sleep(0.01)
-    
-    
\ No newline at end of file
+        return "?"
+    return "ok"
+
+def cmd_logs(args):
+    # boot|segment:size,... for every segment on flash, boot is the id of the running boot
+    return f"{flash_log.boot}|" + ",".join(f"{seg}:{flash_log.segment_length(seg)}" for seg in flash_log.segments())
+
+dump_task = None
+
+async def uart_idle():
+    while not uart.txdone():
+        await asyncio.sleep_ms(UART_TX_POLL_MS)
+
+async def send_dump(segment, offset):
+    # one chunk at a time, the next is only read once the last one is on the wire
+    while True:
+        data = flash_log.read_chunk(segment, offset, FLASH_DUMP_CHUNK)
+        if not data:
+            break
+        await uart_idle()
+        respond(FlashLog.encode_chunk(segment, offset, data))
+        offset += len(data)
+    await uart_idle()
+    respond(f"end,{segment},{offset}")
+
+def cmd_dump(args):
+    # dump <seg> [offset]: stream the rest of a segment, resume from the last offset received
+    # sent from its own task, a whole segment takes seconds on the wire
+    global dump_task
+    args = args.split()
+    segment = int(args[0])
+    offset = int(args[1]) if len(args) > 1 else 0
+    if dump_task is not None:
+        dump_task.cancel()
+    dump_task = asyncio.create_task(send_dump(segment, offset))
+
+def cmd_subscribe(args):
+    # subscribe <hz> [token]: push samples at hz, with token only when handed the token
+    args = args.split()
+    token = len(args) > 1 and args[1] == "token"
+    subscription.start(float(args[0]), token)
+    return "ok"
+
+def cmd_unsubscribe(args):
+    subscription.stop()
+    return "ok"
+
+def cmd_tok(args):
+    # the master hands us the bus, send everything queued since the last token
+    if not subscription.active:
+        return "s|" + str(time.ticks_ms())
+    return subscription.pending()
+
+captures = CaptureSlots()
+
+async def capture_task(capture_id, broadcast_ms):
+    # both sensors convert at once instead of waiting for their next slots
+    await asyncio.gather(read_inner(), read_outer())
+    captures.latch(capture_id, time.ticks_diff(broadcast_ms, inner_ms), time.ticks_diff(broadcast_ms, outer_ms), t_inner, p_inner, t_outer, p_outer)
+
+def cmd_capture(args):
+    # broadcast capture <id>: read both sensors now, captured answers once they are in
+    capture_id = int(args)
+    if captures.begin(capture_id):
+        asyncio.create_task(capture_task(capture_id, time.ticks_ms()))
+
+def cmd_captured(args):
+    # captured <id>: id,inner_age_ms,outer_age_ms,ti,pi,to,po or id,pending
+    capture_id = int(args)
+    return CaptureSlots.format(capture_id, captures.get(capture_id))
+
+def cmd_baud(args):
+    # baud <rate>: ack at the current rate, then switch until a frame at the new rate verifies it
+    rate = int(args)
+    baud.request(rate)
+    return f"ack {rate}"
+
+def cmd_stats(args):
+    # stats [reset]: per stage count,mean,p50,p90,p99,max in us, memory and uart error counters
+    reply = profiler.format({
+        "ovf": line_reader.overflows,
+        "bad": line_reader.bad_frames,
+        "crc": commands.crc_errors,
+        "fb": baud.fallbacks,
+        "drop": subscription.dropped,
+        "fr": ui_pacer.frames,
+        "drawn": ui_pacer.drawn,
+        "miss": ui_pacer.missed,
+        "lat": ui_pacer.latency_max,
+        })
+    if args == "reset":
+        profiler.reset()
+        ui_pacer.reset_stats()
+    return reply
+
+def cmd_fps(args):
+    # fps <n>: target frame rate of the display
+    ui_pacer.set_fps(float(args))
+    return "ok"
+
+def bin_read(payload):
+    return binframe.pack_reading(time.ticks_ms(), t_inner, p_inner, t_outer, p_outer)
+
+def bin_hist(payload):
+    # u16 n
+    n = min(struct.unpack("<H", payload)[0], HISTORY_MAX_REPLY)
+    return binframe.pack_samples(history.last(n), time.ticks_ms())
+
+def bin_since(payload):
+    # u32 seq
+    samples = history.since(struct.unpack("<I", payload)[0], HISTORY_MAX_REPLY)
+    return binframe.pack_samples(samples, time.ticks_ms())
+
+commands.command("read", cmd_read)
+commands.command("open", cmd_open)
+commands.command("close", cmd_close)
+commands.command("sched", cmd_sched)
+commands.command("rate", cmd_rate)
+commands.command("hist", cmd_hist)
+commands.command("since", cmd_since)
+commands.command("agg", cmd_agg)
+commands.command("log", cmd_log)
+commands.command("logs", cmd_logs)
+commands.command("dump", cmd_dump)
+commands.command("subscribe", cmd_subscribe)
+commands.command("unsubscribe", cmd_unsubscribe)
+commands.command("tok", cmd_tok)
+commands.command("captured", cmd_captured)
+commands.broadcast_command("capture", cmd_capture)
+commands.command("baud", cmd_baud)
+commands.command("stats", cmd_stats)
+commands.command("fps", cmd_fps)
+commands.static_reply("ping", "pong")
+commands.static_reply("version", VERSION)
+commands.static_reply("device", DEVICE_TYPE)
+commands.binary_command(binframe.READ, bin_read)
+commands.binary_command(binframe.HIST, bin_hist)
+commands.binary_command(binframe.SINCE, bin_since)
+
+# buttons are polled and acted on as edges, a held button does nothing more
+BUTTON_POLL_MS = 20
+
+async def button_task():
+    b1 = b2 = False
+    while True:
+        pressed = bool(iface.get_btn("B1"))
+        if pressed and not b1:
+            solenoid_on()
+        b1 = pressed
+
+        pressed = bool(iface.get_btn("B2"))
+        if pressed and not b2:
+            solenoid_off()
+        b2 = pressed
+
+        await asyncio.sleep_ms(BUTTON_POLL_MS)
+
+screen = StatusScreen(iface, DEVICE_ADDRESS)
+
+async def ui_task():
+    while True:
+        await ui_pacer.wait()
+        render_start = profiler.start()
+        changed = screen.update(solenoid_state, t_inner, p_inner, t_outer, p_outer, commands, time.time())
+        if changed:
+            screen.render()
+        profiler.end("render", render_start)
+
+        if changed:
+            # only push the frame buffer over I2C when it differs from what is shown
+            show_start = profiler.start()
+            iface.show()
+            profiler.end("show", show_start)
+        ui_pacer.done(changed)
+
+async def main():
+    # one event loop instead of threads, every task sleeps until it has work to do
+    asyncio.create_task(scheduler.run_async())
+    asyncio.create_task(uart_task())
+    asyncio.create_task(button_task())
+    await ui_task()
+
+asyncio.run(main())
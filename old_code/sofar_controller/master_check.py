@@ -0,0 +1,109 @@
+"""
+Checks that a late reply does not answer the wrong request in RS485Master.
+
+A fake port answers every command with 'command#n', n counting how often
+that command was sent, the first reply takes LATE_S against a TIMEOUT_S
+timeout. The retry of A must get A#2 and the next request B#1, where
+without the guard after a timeout A#1 answers the retry and A#2 answers B.
+
+The token path: a fake device answers 'tok' with an s| reply of one sample
+and pushes a sample just before it answers 'read'. token_loop must get its
+replies without a timeout and publish their samples, the push must be
+published too and not taken for the reply to read.
+python master_check.py
+"""
+import asyncio
+import collections
+import queue
+import threading
+
+from rs485_master import RS485Master, TOKEN
+
+TIMEOUT_S = 0.1
+LATE_S = 0.105
+REPLY_S = 0.01
+TOKEN_HZ = 20
+TOKEN_S = 0.3
+PUSHED_SEQ = 1000
+
+
+class LatePort:
+    def __init__(self, first_delay, delay=REPLY_S):
+        self.first_delay = first_delay
+        self.delay = delay
+        self.sent = collections.Counter()
+        self.lines = queue.Queue()
+
+    def write(self, data):
+        address, _, command = data.decode("ascii").strip().split(":", 2)
+        self.sent[command] += 1
+        lines = [f"00:{address}:{reply}\r\n".encode("ascii") for reply in self.replies(command, self.sent[command])]
+        delay = self.first_delay if sum(self.sent.values()) == 1 else self.delay
+        threading.Timer(delay, lambda: [self.lines.put(line) for line in lines]).start()
+
+    def replies(self, command, n):
+        return [f"{command}#{n}"]
+
+    def readline(self):
+        try:
+            return self.lines.get(timeout=0.05)
+        except queue.Empty:
+            return b""
+
+
+class TokenPort(LatePort):
+    def __init__(self):
+        super().__init__(REPLY_S)
+
+    def replies(self, command, n):
+        if command == TOKEN:
+            return [f"s|{n * 50}|{n},{n * 50},22.00,1013.000,22.10,1013.100"]
+        push = PUSHED_SEQ + n
+        return [f"s|{push}|{push},{push},22.00,1013.000,22.10,1013.100"] + super().replies(command, n)
+
+
+async def requests(first_delay):
+    master = RS485Master(LatePort(first_delay), timeout=TIMEOUT_S)
+    await master.start()
+    try:
+        a = await master.request("02", "A")
+        b = await master.request("02", "B")
+    finally:
+        await master.stop()
+    return a, b, master.timeouts["02"], master.late["02"]
+
+
+async def token_pass():
+    master = RS485Master(TokenPort(), timeout=TIMEOUT_S)
+    await master.start()
+    try:
+        task = asyncio.create_task(master.token_loop(["02"], TOKEN_HZ))
+        await asyncio.sleep(TOKEN_S)
+        task.cancel()
+        read = await master.request("02", "read")
+    finally:
+        await master.stop()
+    samples = master.stream("02")
+    seqs = [samples.get_nowait()[0] for _ in range(samples.qsize())]
+    return read, seqs, master.timeouts["02"]
+
+
+def main():
+    a, b, timeouts, late = asyncio.run(requests(LATE_S))
+    print(f"first reply after {LATE_S * 1000:.0f} ms: A -> {a}, B -> {b}, {timeouts} timeouts, {late} late")
+    assert (a, b) == ("A#2", "B#1"), "a late reply answered the wrong request"
+    assert late == 1
+
+    a, b, timeouts, late = asyncio.run(requests(REPLY_S))
+    print(f"first reply after {REPLY_S * 1000:.0f} ms: A -> {a}, B -> {b}, {timeouts} timeouts, {late} late")
+    assert (a, b, timeouts, late) == ("A#1", "B#1", 0, 0)
+
+    read, seqs, timeouts = asyncio.run(token_pass())
+    print(f"token loop for {TOKEN_S * 1000:.0f} ms: samples {seqs}, read -> {read}, {timeouts} timeouts")
+    assert timeouts == 0, "token replies were not taken as replies"
+    assert len(seqs) >= 3 and seqs[:-1] == list(range(1, len(seqs))), "token samples were not published"
+    assert seqs[-1] == PUSHED_SEQ + 1 and read == "read#1", "a push answered a request"
+
+
+if __name__ == "__main__":
+    main()
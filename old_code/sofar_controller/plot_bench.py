@@ -0,0 +1,96 @@
+"""
+Redraw cost of the live plot over a long test.
+
+Feeds an 8 hour, 1 Hz session of synthetic readings into LivePlot on the
+Agg backend and reports the mean cost per sample at the start and the end
+of the session, how many full redraws rescaling caused, what one of them
+costs at the end and how many points a line then holds. For comparison
+the old animate() redraw (clear both axes, replot everything against
+string timestamps) is timed at a few history lengths.
+python plot_bench.py [--hours 8]
+"""
+import argparse
+import datetime
+import math
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
+
+from liveplot import LivePlot
+
+
+def reading(i):
+    drift = 0.5 * math.sin(i / 3600)
+    return (22.1 + drift, 1015.73 - i * 0.0005, 23.8 + drift, 1015.38)
+
+
+def legacy_frame(ax1, ax2, timestamps, series):
+    t1, p1, t2, p2 = series
+    ax1.clear()
+    ax1.plot(timestamps, t1, label='Temperature1', color='blue')
+    ax1.plot(timestamps, t2, label='Temperature2', color='red')
+    ax1.set_ylim(15, 30)
+    ax1.legend(loc='upper left')
+    ax1.xaxis.set_major_locator(MaxNLocator(nbins=10))
+    ax2.clear()
+    ax2.plot(timestamps, p1, label='Pressure1', color='blue')
+    ax2.plot(timestamps, p2, label='Pressure2', color='red')
+    ax2.set_ylim(400, 1300)
+    ax2.legend(loc='upper left')
+    ax2.xaxis.set_major_locator(MaxNLocator(nbins=10))
+    ax1.figure.canvas.draw()
+
+
+def bench_live(samples):
+    fig, axes = plt.subplots(2, 1, figsize=(10, 8))
+    plot = LivePlot(fig, axes)
+    fig.canvas.draw()
+    start_time = datetime.datetime(2024, 8, 29, 17, 35)
+    costs = []
+    for i in range(samples):
+        when = start_time + datetime.timedelta(seconds=i)
+        start = time.perf_counter()
+        plot.add(when, reading(i))
+        costs.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    plot._rescale()
+    full_draw = time.perf_counter() - start
+    points = len(plot.lines[0].get_xdata())
+    plt.close(fig)
+    return costs, plot.full_draws, full_draw, points
+
+
+def bench_legacy(n):
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
+    start_time = datetime.datetime(2024, 8, 29, 17, 35)
+    timestamps = [(start_time + datetime.timedelta(seconds=i)).strftime("%Y-%m-%d\n%H:%M:%S") for i in range(n)]
+    series = list(zip(*(reading(i) for i in range(n))))
+    start = time.perf_counter()
+    legacy_frame(ax1, ax2, timestamps, series)
+    elapsed = time.perf_counter() - start
+    plt.close(fig)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the live plot redraw over a long session")
+    parser.add_argument("--hours", type=float, default=8)
+    args = parser.parse_args()
+
+    samples = int(args.hours * 3600)
+    costs, full_draws, full_draw, points = bench_live(samples)
+    window = min(1000, samples // 2)
+    first = sum(costs[:window]) / window
+    last = sum(costs[-window:]) / window
+    print(f"LivePlot, {samples} samples: {first * 1000:.2f} ms/sample over the first {window}, "
+          f"{last * 1000:.2f} ms over the last {window}, {full_draws} full redraws, {sum(costs):.1f} s total")
+    print(f"full redraw at the end: {full_draw * 1000:.0f} ms, {points} points per line")
+    for n in (500, 2000, 8000):
+        print(f"old animate() redraw with {n} samples: {bench_legacy(n) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
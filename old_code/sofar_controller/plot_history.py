@@ -0,0 +1,98 @@
+import tempfile
+
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points of (x, y) that Largest-Triangle-Three-Buckets keeps."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    # n_out - 2 buckets between the first and last point, each at least one point wide
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = end, edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # the point of this bucket spanning the largest triangle with the last kept point and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+class PlotHistory:
+    """
+    Session history for the live plot with a fixed memory footprint.
+
+    The newest samples live in a preallocated ring of rows. Before a row is
+    overwritten it is written to a file at full resolution, together with
+    the rows after it, spill_block rows per write. session() memory maps the
+    spilled rows back, so the whole session is still there to downsample
+    for display.
+    """
+
+    def __init__(self, columns, capacity=8192, spill_block=1024, spill=None):
+        self.ring = np.empty((capacity, columns))
+        self.capacity = capacity
+        self.spill_block = min(spill_block, capacity)
+        self.spill = spill if spill is not None else tempfile.TemporaryFile()
+        self.total = 0
+        self.spilled = 0
+        self.low = np.full(columns, np.inf)
+        self.high = np.full(columns, -np.inf)
+
+    def __len__(self):
+        return self.total
+
+    def append(self, row):
+        if self.total - self.spilled == self.capacity:
+            self._spill()
+        self.ring[self.total % self.capacity] = row
+        np.minimum(self.low, row, out=self.low)
+        np.maximum(self.high, row, out=self.high)
+        self.total += 1
+
+    def _rows(self, start, end):
+        """The ring rows for samples start..end, as one or two slices."""
+        first = start % self.capacity
+        count = end - start
+        if first + count <= self.capacity:
+            return [self.ring[first:first + count]]
+        return [self.ring[first:], self.ring[:first + count - self.capacity]]
+
+    def _spill(self):
+        end = min(self.spilled + self.spill_block, self.total)
+        for rows in self._rows(self.spilled, end):
+            rows.tofile(self.spill)
+        self.spill.flush()
+        self.spilled = end
+
+    def last(self, n):
+        """The newest n samples, oldest first."""
+        n = min(n, self.total)
+        return np.concatenate(self._rows(self.total - n, self.total))
+
+    def first(self):
+        if self.spilled:
+            return np.memmap(self.spill, dtype=self.ring.dtype, mode='r', shape=(1, self.ring.shape[1]))[0]
+        return self.ring[0]
+
+    def session(self):
+        """Every sample so far, oldest first."""
+        parts = self._rows(self.spilled, self.total)
+        if self.spilled:
+            parts.insert(0, np.memmap(self.spill, dtype=self.ring.dtype, mode='r', shape=(self.spilled, self.ring.shape[1])))
+        return np.concatenate(parts)
+
+    def close(self):
+        self.spill.close()
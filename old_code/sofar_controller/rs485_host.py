@@ -0,0 +1,213 @@
+import os
+import struct
+import sys
+import time
+
+import serial
+import serial.tools.list_ports
+
+# the frame format is shared with the firmware
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "libs"))
+import binframe
+from baudlink import VERIFY_MS
+
+HOST_ADDRESS = "00"
+BROADCAST_ADDRESS = "99"
+FALLBACK_MARGIN_S = 0.1 # the device looks at its verify deadline between frames
+
+
+def find_ft232r_port():
+
+    for port in serial.tools.list_ports.comports():
+        if port is not None:
+            print(port.description, port.product)
+            if port.product is not None:
+                if "FT232R" in port.product:
+                    return port.device
+                if "FT232R" in port.description:
+                    return port.device
+
+    return None
+
+
+def open_port(baudrate=115200, timeout=1):
+    serial_port = find_ft232r_port()
+    if not serial_port:
+        raise RuntimeError("FT232R device not found.")
+    return serial.Serial(serial_port, baudrate, timeout=timeout)
+
+
+def send(ser, address, command):
+    ser.write(f"{address}:{HOST_ADDRESS}:{command}\n".encode("ascii"))
+
+
+def read_reply(ser, address):
+    """Read lines until a reply from address arrives, None on timeout."""
+    prefix = f"{HOST_ADDRESS}:{address}:"
+    while True:
+        line = ser.readline()
+        if not line:
+            return None
+        line = line.decode("ascii", errors="replace").strip()
+        if line.startswith(prefix):
+            return line[len(prefix):]
+
+
+def query(ser, address, command):
+    send(ser, address, command)
+    return read_reply(ser, address)
+
+
+def batch(ser, address, commands):
+    """Run several commands in one frame, returns their replies in order or None on timeout."""
+    reply = query(ser, address, ";".join(commands))
+    if reply is None:
+        return None
+    return reply.split(";")
+
+
+def negotiate_baud(ser, address, rate, verify_ms=VERIFY_MS, attempts=3):
+    """
+    Move the link to a device onto a new baud rate.
+
+    The device acks at the current rate and switches, then both sides
+    verify the new rate with a ping within verify_ms, which must match the
+    device's. If no ping is answered the port waits out the rest of that
+    window, until the device has gone back to the old rate on its own, and
+    then goes back too. Returns True if the new rate is in use.
+
+    Single drop only: the other devices on the bus stay at the old rate
+    and can't be reached while the link runs at the new one.
+    """
+    old_rate = ser.baudrate
+    if query(ser, address, f"baud {rate}") != f"ack {rate}":
+        return False
+    # the device started its window when it sent the ack, before it got here
+    fallback_at = time.monotonic() + verify_ms / 1000 + FALLBACK_MARGIN_S
+
+    ser.baudrate = rate
+    old_timeout = ser.timeout
+    ser.timeout = verify_ms / 1000 / attempts
+    try:
+        for _ in range(attempts):
+            ser.reset_input_buffer()
+            if query(ser, address, "ping") == "pong":
+                return True
+    finally:
+        ser.timeout = old_timeout
+
+    time.sleep(max(0, fallback_at - time.monotonic()))
+    ser.baudrate = old_rate
+    return False
+
+
+def send_binary(ser, address, frame_type, payload=b""):
+    ser.write(binframe.encode(int(address), int(HOST_ADDRESS), frame_type, payload))
+
+
+def read_binary_reply(ser, address):
+    """Read until a valid binary frame from address arrives, returns (type, payload) or None on timeout."""
+    while True:
+        sync = ser.read(1)
+        if not sync:
+            return None
+        if sync[0] != binframe.SYNC:
+            continue
+        header = sync + ser.read(binframe.HEADER_SIZE - 1)
+        if len(header) < binframe.HEADER_SIZE:
+            return None
+        length = binframe.frame_length(header)
+        if length < 0:
+            continue
+        frame = header + ser.read(length - binframe.HEADER_SIZE)
+        if len(frame) < length:
+            return None
+        decoded = binframe.decode(frame)
+        if decoded is None:
+            continue
+        to_address, from_address, frame_type, payload = decoded
+        if to_address == int(HOST_ADDRESS) and from_address == int(address):
+            return frame_type, bytes(payload)
+
+
+def query_binary(ser, address, frame_type, payload=b""):
+    send_binary(ser, address, frame_type, payload)
+    reply = read_binary_reply(ser, address)
+    if reply is None or reply[0] != frame_type | binframe.REPLY:
+        return None
+    return reply[1]
+
+
+def read_sensors(ser, address, binary=False):
+    """Return (t_inner, p_inner, t_outer, p_outer) or None, using the text or binary protocol."""
+    if binary:
+        payload = query_binary(ser, address, binframe.READ)
+        if payload is None:
+            return None
+        return binframe.unpack_reading(payload)[1:]
+    reply = query(ser, address, "read")
+    if reply is None:
+        return None
+    data = reply.split(',')
+    if len(data) != 4:
+        return None
+    return tuple(float(v) for v in data)
+
+
+def read_history(ser, address, since_seq=None, count=32):
+    """Return (now_ms, samples) from the binary history commands, or None."""
+    if since_seq is None:
+        payload = query_binary(ser, address, binframe.HIST, struct.pack("<H", count))
+    else:
+        payload = query_binary(ser, address, binframe.SINCE, struct.pack("<I", since_seq))
+    if payload is None:
+        return None
+    return binframe.unpack_samples(payload)
+
+
+def parse_samples(reply):
+    """Parse a 'now|seq,ms,ti,pi,to,po|...' reply into (now_ms, samples)."""
+    parts = reply.split('|')
+    samples = []
+    for part in parts[1:]:
+        fields = part.split(',')
+        samples.append((int(fields[0]), int(fields[1])) + tuple(float(v) for v in fields[2:]))
+    return int(parts[0]), samples
+
+
+def subscribe(ser, address, rate_hz, token=False):
+    command = f"subscribe {rate_hz} token" if token else f"subscribe {rate_hz}"
+    return query(ser, address, command) == "ok"
+
+
+def unsubscribe(ser, address):
+    return query(ser, address, "unsubscribe") == "ok"
+
+
+def stream(ser, address):
+    """Yield samples pushed by a free running subscription, stops on a read timeout."""
+    prefix = f"{HOST_ADDRESS}:{address}:s|"
+    while True:
+        line = ser.readline()
+        if not line:
+            return
+        line = line.decode("ascii", errors="replace").strip()
+        if line.startswith(prefix):
+            yield from parse_samples(line[len(prefix):])[1]
+
+
+def token_stream(ser, addresses):
+    """
+    Pass the token round the devices and yield (address, sample) for everything they queued.
+
+    Only the device holding the token talks, so any number of token mode
+    subscriptions can share the bus. Each pass costs one round trip per
+    device no matter how many samples they send.
+    """
+    while True:
+        for address in addresses:
+            reply = query(ser, address, "tok")
+            if reply is None or not reply.startswith("s|"):
+                continue
+            for sample in parse_samples(reply[2:])[1]:
+                yield address, sample
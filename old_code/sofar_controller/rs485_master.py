@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import threading
+import time
+
+import rs485_host
+
+TOKEN = "tok" # answered with s|..., like the pushes of a free running subscription
+
+
+class DeviceTimeout(Exception):
+    pass
+
+
+class RS485Master:
+    """
+    asyncio master for many devices on one RS485 bus.
+
+    A reader thread owns the receive side of the serial port and hands
+    every frame to the event loop, where replies are matched to requests
+    by device address. Requests are pipelined through a window of
+    outstanding requests: on a half duplex bus keep window=1 so the next
+    request goes out as soon as the previous reply lands, with full duplex
+    transceivers it can be raised. Either way a cycle over N devices costs
+    N round trips instead of N fixed sleeps.
+
+    Replies carry no request id, so after a timeout the device's replies
+    are dropped for guard seconds (the timeout by default) before the
+    request is sent again. A reply that was only late is counted in late
+    instead of answering the retry, whose own reply would then answer the
+    next request. Replies later than timeout + guard can still be taken
+    for the next one, size the two for the slowest device.
+
+    Lines starting with 's|' are samples pushed by a subscription and go to
+    the device's stream, unless the oldest request waiting on it is a
+    token: its reply looks the same and answers the request.
+    """
+
+    def __init__(self, ser, timeout=0.1, retries=2, window=1, queue_size=1000, guard=None):
+        self.ser = ser
+        self.timeout = timeout
+        self.guard = timeout if guard is None else guard
+        self.retries = retries
+        self.window = window
+        self.queue_size = queue_size
+
+        self.pending = collections.defaultdict(collections.deque)
+        self.streams = {}
+        self.dropped = collections.Counter()
+        self.timeouts = collections.Counter()
+        self.late = collections.Counter()
+        self._quiet_until = {}
+
+        self._capture_ids = itertools.count(int(time.time()) % 100000)
+        self._loop = None
+        self._slots = None
+        self._reader = None
+        self._running = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.window)
+        self._running = True
+        self._reader = threading.Thread(target=self._read_lines, daemon=True)
+        self._reader.start()
+
+    async def stop(self):
+        self._running = False
+        if self._reader is not None:
+            await self._loop.run_in_executor(None, self._reader.join)
+
+    def _read_lines(self):
+        while self._running:
+            line = self.ser.readline()
+            if line:
+                self._loop.call_soon_threadsafe(self._on_line, line.decode("ascii", errors="replace").strip())
+
+    def _on_line(self, line):
+        if len(line) < 6 or line[2] != ':' or line[5] != ':' or line[0:2] != rs485_host.HOST_ADDRESS:
+            return
+        address = line[3:5]
+        reply = line[6:]
+
+        quiet_until = self._quiet_until.get(address)
+        if quiet_until is not None and self._loop.time() >= quiet_until:
+            del self._quiet_until[address]
+            quiet_until = None
+
+        waiting = self.pending[address]
+        while waiting and waiting[0][1].done():
+            waiting.popleft()
+
+        if reply.startswith("s|") and (quiet_until is not None or not waiting or waiting[0][0] != TOKEN):
+            # pushed by a free running subscription, or the late answer to a
+            # token, the device has moved past these samples either way
+            for sample in rs485_host.parse_samples(reply[2:])[1]:
+                self._publish(address, sample)
+            return
+
+        if quiet_until is not None:
+            # answers a request that already timed out
+            self.late[address] += 1
+            return
+        if waiting:
+            waiting.popleft()[1].set_result(reply)
+
+    def _publish(self, address, sample):
+        queue = self.stream(address)
+        if queue.full():
+            queue.get_nowait()
+            self.dropped[address] += 1
+        queue.put_nowait(sample)
+
+    def stream(self, address):
+        if address not in self.streams:
+            self.streams[address] = asyncio.Queue(self.queue_size)
+        return self.streams[address]
+
+    async def samples(self, address):
+        """Async iterator over samples from one device."""
+        queue = self.stream(address)
+        while True:
+            yield await queue.get()
+
+    async def request(self, address, command, timeout=None, retries=None):
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        for _ in range(retries + 1):
+            future = self._loop.create_future()
+            entry = (command, future)
+            async with self._slots:
+                self.pending[address].append(entry)
+                rs485_host.send(self.ser, address, command)
+                try:
+                    return await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts[address] += 1
+                    if entry in self.pending[address]:
+                        self.pending[address].remove(entry)
+                    # still holding the slot, a late reply may be on the bus
+                    self._quiet_until[address] = self._loop.time() + self.guard
+                    await asyncio.sleep(self.guard)
+        raise DeviceTimeout(f"no reply from {address} to '{command}'")
+
+    async def batch(self, address, commands, timeout=None, retries=None):
+        """Run several commands in one frame, returns their replies in order."""
+        reply = await self.request(address, ";".join(commands), timeout, retries)
+        return reply.split(";")
+
+    async def read(self, address):
+        """Return (host time, t_inner, p_inner, t_outer, p_outer) from one device."""
+        reply = await self.request(address, "read")
+        data = reply.split(',')
+        if len(data) != 4:
+            raise ValueError(f"bad read reply from {address}: {reply}")
+        return (time.time(),) + tuple(float(v) for v in data)
+
+    async def poll_all(self, addresses):
+        """Read every device once, returns {address: sample or exception}."""
+        results = await asyncio.gather(*(self.read(address) for address in addresses), return_exceptions=True)
+        return dict(zip(addresses, results))
+
+    async def broadcast(self, command):
+        """Send a command to every device, nobody replies to a broadcast."""
+        async with self._slots:
+            rs485_host.send(self.ser, rs485_host.BROADCAST_ADDRESS, command)
+
+    async def _captured(self, address, capture_id, settle, wait):
+        # asks again while the device is still converting
+        deadline = self._loop.time() + wait
+        while True:
+            reply = await self.request(address, f"captured {capture_id}")
+            if not reply.endswith(",pending") or self._loop.time() >= deadline:
+                return reply
+            await asyncio.sleep(settle)
+
+    async def capture(self, addresses, settle=0.02, wait=0.5):
+        """
+        Take a synchronized capture across devices.
+
+        Every device starts a conversion of both its sensors on the same
+        broadcast frame, the slots are collected afterwards, asking again
+        every settle seconds for up to wait seconds while a slot is
+        pending. Each device also reports the age of its readings at the
+        broadcast, negative as they are taken after it, so the effective
+        sample time of a channel is the broadcast time minus its age. The
+        skew of a channel is the spread of its sample times across the
+        devices.
+
+        Returns (results, skew_ms) where results maps address to
+        (inner_age_ms, outer_age_ms, t_inner, p_inner, t_outer, p_outer)
+        or the exception raised while collecting it, and skew_ms maps
+        "inner" and "outer" to their skew, None without any readings.
+        """
+        capture_id = next(self._capture_ids)
+        await self.broadcast(f"capture {capture_id}")
+        await asyncio.sleep(settle)
+
+        replies = await asyncio.gather(*(self._captured(address, capture_id, settle, wait) for address in addresses), return_exceptions=True)
+        results = {}
+        ages = {"inner": [], "outer": []}
+        for address, reply in zip(addresses, replies):
+            if isinstance(reply, Exception):
+                results[address] = reply
+                continue
+            fields = reply.split(',')
+            if len(fields) != 7 or int(fields[0]) != capture_id:
+                results[address] = ValueError(f"bad capture reply from {address}: {reply}")
+                continue
+            slot = (int(fields[1]), int(fields[2])) + tuple(float(v) for v in fields[3:])
+            results[address] = slot
+            ages["inner"].append(slot[0])
+            ages["outer"].append(slot[1])
+
+        skew_ms = {channel: max(values) - min(values) if values else None for channel, values in ages.items()}
+        return results, skew_ms
+
+    async def poll_loop(self, addresses, rate_hz):
+        """Poll every device at rate_hz and publish the readings to their streams."""
+        period = 1 / rate_hz
+        while True:
+            start = time.monotonic()
+            for address, sample in (await self.poll_all(addresses)).items():
+                if not isinstance(sample, Exception):
+                    self._publish(address, sample)
+            await asyncio.sleep(max(0, period - (time.monotonic() - start)))
+
+    async def token_loop(self, addresses, rate_hz):
+        """Pass the token round token mode subscriptions and publish what they queued."""
+        period = 1 / rate_hz
+        while True:
+            start = time.monotonic()
+            for address in addresses:
+                try:
+                    reply = await self.request(address, TOKEN)
+                except DeviceTimeout:
+                    continue
+                if reply.startswith("s|"):
+                    for sample in rs485_host.parse_samples(reply[2:])[1]:
+                        self._publish(address, sample)
+            await asyncio.sleep(max(0, period - (time.monotonic() - start)))
+
+
+async def _main(args):
+    ser = rs485_host.open_port(args.baud, timeout=0.05)
+    master = RS485Master(ser, timeout=args.timeout, window=args.window)
+    await master.start()
+    try:
+        while True:
+            start = time.monotonic()
+            if args.capture:
+                results, skew_ms = await master.capture(args.addresses)
+                print(f"skew: inner {skew_ms['inner']} ms, outer {skew_ms['outer']} ms")
+            else:
+                results = await master.poll_all(args.addresses)
+            cycle = time.monotonic() - start
+            for address, sample in results.items():
+                print(f"{address}: {sample}")
+            print(f"cycle: {cycle * 1000:.1f} ms for {len(args.addresses)} devices, timeouts: {dict(master.timeouts)}, late: {dict(master.late)}")
+            await asyncio.sleep(max(0, 1 / args.rate - cycle))
+    finally:
+        await master.stop()
+        ser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll many sofar controllers on one RS485 bus")
+    parser.add_argument("addresses", nargs="+")
+    parser.add_argument("--rate", type=float, default=1)
+    parser.add_argument("--timeout", type=float, default=0.1)
+    parser.add_argument("--window", type=int, default=1)
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--capture", action="store_true", help="take synchronized captures instead of polling")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,315 @@
+"""
+Time range index over the recorded sessions, so a query reads only the
+blocks it overlaps instead of every file in the directory.
+
+The index lives in .session_index/ next to the sessions. 'files' lists the
+session files, one name per line. 'blocks' is a header and then one fixed
+size record per device in a column log block or csv row group, with its
+time range, file, byte offset and length. data_plotter.py adds a record for
+every block ColumnLog writes, and backfill() indexes the files that are not
+in the index yet, csvs in row groups of ROW_GROUP_ROWS rows. A csv exported
+from a column log is skipped, the log already holds its rows.
+
+Records are kept in order of start time next to the running maximum of
+their end times, so the first and last record a query can overlap are two
+binary searches on a memory map of 'blocks'. What a query costs depends on
+how much it returns, not on how long the archive is.
+
+Times are epoch seconds. The csvs hold local time, as export_csv writes it,
+csv_loader.local_epoch converts it.
+
+python session_index.py backfill [directory] [--rebuild]
+python session_index.py query START END [--device N] [--directory D]
+"""
+import argparse
+import datetime
+import glob
+import os
+import shutil
+import struct
+import time
+
+import numpy as np
+
+import columnlog
+import csv_loader
+
+INDEX_DIR = ".session_index"
+SESSION_PATTERNS = (csv_loader.PATTERN, "pressure data - *.col")
+ROW_GROUP_ROWS = 1024
+CSV_DEVICE = 2 # the csvs have no device column, they all came from address 02
+
+INDEX_MAGIC = b"PIDX"
+INDEX_VERSION = 1
+HEADER = "<4sBB2x" # magic, version, sorted
+HEADER_SIZE = struct.calcsize(HEADER)
+SORTED_OFFSET = 5
+RECORD_DTYPE = np.dtype([
+    ("start", "<f8"),
+    ("end", "<f8"),
+    ("reach", "<f8"), # latest end of this and every earlier record
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("rows", "<u4"),
+    ("file", "<u4"),
+    ("device", "u1"),
+    ("pad", "V3"),
+    ])
+RESULT_COLUMNS = ("epoch", "device") + csv_loader.COLUMNS
+
+
+def _epoch(when):
+    return when.timestamp() if isinstance(when, datetime.datetime) else float(when)
+
+
+def _device_records(offset, length, epoch, device):
+    """Records of one block, one per device in it, file and reach are filled in by the caller."""
+    devices = np.unique(device)
+    records = np.zeros(len(devices), RECORD_DTYPE)
+    for record, address in zip(records, devices):
+        times = epoch[device == address] if len(devices) > 1 else epoch
+        record["start"], record["end"] = times.min(), times.max()
+        record["offset"], record["length"], record["rows"] = offset, length, len(times)
+        record["device"] = address
+    return records
+
+
+def _scan_csv(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    body_start = data.find(b"\n") + 1
+    if not body_start:
+        return np.zeros(0, RECORD_DTYPE)
+    body = data[body_start:]
+    ends = csv_loader.row_offsets(body)
+    records = []
+    for first in range(0, len(ends), ROW_GROUP_ROWS):
+        low = ends[first - 1] if first else 0
+        high = ends[min(first + ROW_GROUP_ROWS, len(ends)) - 1]
+        epoch = csv_loader.local_epoch(csv_loader.parse_rows(body[low:high])["timestamp"])
+        if len(epoch):
+            records.append(_device_records(body_start + low, high - low, epoch, np.full(len(epoch), CSV_DEVICE, np.uint8)))
+    return np.concatenate(records) if records else np.zeros(0, RECORD_DTYPE)
+
+
+def _scan_log(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(columnlog.FILE_MAGIC):
+        return np.zeros(0, RECORD_DTYPE)
+    records = []
+    offset = len(columnlog.FILE_MAGIC)
+    while True:
+        block = columnlog.read_block(data, offset)
+        if block is None:
+            break
+        columns, end = block
+        if len(columns["epoch"]):
+            records.append(_device_records(offset, end - offset, columns["epoch"], columns["device"]))
+        offset = end
+    return np.concatenate(records) if records else np.zeros(0, RECORD_DTYPE)
+
+
+def _decode(path, data):
+    """Result columns of one indexed block or row group."""
+    if path.endswith(".col"):
+        columns, end = columnlog.read_block(data)
+        result = {"epoch": columns["epoch"], "device": columns["device"]}
+        result.update((name, columns[name].astype(float)) for name in csv_loader.COLUMNS)
+        return result
+    columns = csv_loader.parse_rows(data)
+    result = {"epoch": csv_loader.local_epoch(columns["timestamp"]),
+              "device": np.full(len(columns["timestamp"]), CSV_DEVICE, np.uint8)}
+    result.update((name, columns[name]) for name in csv_loader.COLUMNS)
+    return result
+
+
+def _empty_result():
+    result = {"epoch": np.empty(0), "device": np.empty(0, np.uint8)}
+    result.update((name, np.empty(0)) for name in csv_loader.COLUMNS)
+    return result
+
+
+class SessionIndex:
+    """
+    The index of the sessions in one directory. add_block() is ColumnLog's
+    on_block, backfill() rewrites the index and must not run while a
+    plotter is recording into the same directory.
+    """
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self.index_dir = os.path.join(directory, INDEX_DIR)
+        self.files_path = os.path.join(self.index_dir, "files")
+        self.blocks_path = os.path.join(self.index_dir, "blocks")
+        self.blocks_read = 0 # by the last query
+        os.makedirs(self.index_dir, exist_ok=True)
+        if not os.path.exists(self.blocks_path) or os.path.getsize(self.blocks_path) < HEADER_SIZE:
+            self._write_records(np.zeros(0, RECORD_DTYPE))
+        self._read_files()
+        self._read_tail()
+
+    def _read_files(self):
+        self.files = []
+        if os.path.exists(self.files_path):
+            with open(self.files_path) as f:
+                self.files = f.read().splitlines()
+        self.file_ids = {name: i for i, name in enumerate(self.files)}
+
+    def _read_tail(self):
+        records = self.records()
+        self.last_start = records["start"][-1] if len(records) else -np.inf
+        self.reach = records["reach"][-1] if len(records) else -np.inf
+
+    def _file_id(self, name):
+        if name not in self.file_ids:
+            with open(self.files_path, "a") as f:
+                f.write(name + "\n")
+            self.file_ids[name] = len(self.files)
+            self.files.append(name)
+        return self.file_ids[name]
+
+    def _write_records(self, records):
+        # write then rename so a query never sees half an index
+        temp_path = self.blocks_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(struct.pack(HEADER, INDEX_MAGIC, INDEX_VERSION, 1))
+            f.write(records.tobytes())
+        os.replace(temp_path, self.blocks_path)
+
+    def is_sorted(self):
+        with open(self.blocks_path, "rb") as f:
+            magic, version, is_sorted = struct.unpack(HEADER, f.read(HEADER_SIZE))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Not a session index: {self.blocks_path}")
+        return bool(is_sorted)
+
+    def records(self):
+        """Every record, memory mapped."""
+        count = (os.path.getsize(self.blocks_path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count <= 0:
+            return np.zeros(0, RECORD_DTYPE)
+        return np.memmap(self.blocks_path, RECORD_DTYPE, "r", HEADER_SIZE, (count,))
+
+    def add_block(self, path, offset, length, columns):
+        """Index one block of a column log as it is written."""
+        records = _device_records(offset, length, columns["epoch"], columns["device"])
+        records.sort(order="start")
+        records["file"] = self._file_id(os.path.relpath(path, self.directory))
+        records["reach"] = np.maximum.accumulate(np.maximum(records["end"], self.reach))
+        with open(self.blocks_path, "r+b") as f:
+            if records["start"][0] < self.last_start:
+                # the clock went back, queries scan every record until the next backfill sorts them
+                f.seek(SORTED_OFFSET)
+                f.write(b"\x00")
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+        self.last_start = records["start"][-1]
+        self.reach = records["reach"][-1]
+
+    def backfill(self):
+        """Index every session file that is not in the index yet, returns how many there were."""
+        paths = sorted(set(path for pattern in SESSION_PATTERNS
+                           for path in glob.glob(os.path.join(self.directory, pattern))))
+        new = []
+        for path in paths:
+            name = os.path.relpath(path, self.directory)
+            if name in self.file_ids:
+                continue
+            if name.endswith(".csv") and os.path.exists(os.path.splitext(path)[0] + ".col"):
+                continue # exported from the log, which is indexed
+            records = _scan_log(path) if name.endswith(".col") else _scan_csv(path)
+            records["file"] = self._file_id(name)
+            new.append(records)
+        if not new and self.is_sorted():
+            return 0
+
+        records = np.concatenate([np.array(self.records())] + new)
+        records = records[np.argsort(records["start"], kind="stable")]
+        if len(records):
+            records["reach"] = np.maximum.accumulate(records["end"])
+        self._write_records(records)
+        self._read_tail()
+        return len(new)
+
+    def rebuild(self):
+        """Throw the index away and index every session again."""
+        shutil.rmtree(self.index_dir)
+        self.__init__(self.directory)
+        return self.backfill()
+
+    def query(self, start, end, device=None):
+        """
+        Samples from start to end inclusive, datetimes or epoch seconds, as
+        {'epoch', 'device', 'temperature1', ...} in time order. Only the
+        blocks overlapping the range are read.
+        """
+        start, end = _epoch(start), _epoch(end)
+        records = self.records()
+        if self.is_sorted():
+            first = np.searchsorted(records["reach"], start)
+            last = np.searchsorted(records["start"], end, "right")
+            records = records[first:last]
+        records = np.array(records)
+        overlapping = (records["end"] >= start) & (records["start"] <= end)
+        if device is not None:
+            overlapping &= records["device"] == device
+
+        # a block with several devices has a record for each, it is read once
+        blocks = sorted(set(zip(records["file"][overlapping].tolist(),
+                                records["offset"][overlapping].tolist(),
+                                records["length"][overlapping].tolist())))
+        self.blocks_read = len(blocks)
+        if blocks and blocks[-1][0] >= len(self.files):
+            self._read_files() # files a plotter added since this index was opened
+
+        parts = []
+        open_file = (None, None)
+        for file_id, offset, length in blocks:
+            if open_file[0] != file_id:
+                if open_file[1] is not None:
+                    open_file[1].close()
+                open_file = (file_id, open(os.path.join(self.directory, self.files[file_id]), "rb"))
+            f = open_file[1]
+            f.seek(offset)
+            columns = _decode(self.files[file_id], f.read(length))
+            keep = (columns["epoch"] >= start) & (columns["epoch"] <= end)
+            if device is not None:
+                keep &= columns["device"] == device
+            parts.append({name: column[keep] for name, column in columns.items()})
+        if open_file[1] is not None:
+            open_file[1].close()
+
+        if not parts:
+            return _empty_result()
+        result = {name: np.concatenate([part[name] for part in parts]) for name in RESULT_COLUMNS}
+        order = np.argsort(result["epoch"], kind="stable")
+        return {name: column[order] for name, column in result.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index recorded sessions and query them by time")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="index the sessions not indexed yet")
+    backfill_parser.add_argument("directory", nargs="?", default=".")
+    backfill_parser.add_argument("--rebuild", action="store_true", help="index every session again")
+    query_parser = subparsers.add_parser("query", help="print the samples in a time range")
+    query_parser.add_argument("start", type=datetime.datetime.fromisoformat)
+    query_parser.add_argument("end", type=datetime.datetime.fromisoformat)
+    query_parser.add_argument("--device", type=int)
+    query_parser.add_argument("--directory", default=".")
+    args = parser.parse_args()
+
+    index = SessionIndex(args.directory)
+    if args.command == "backfill":
+        start = time.perf_counter()
+        added = index.rebuild() if args.rebuild else index.backfill()
+        print(f"indexed {added} files, {len(index.records())} records in {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        start = time.perf_counter()
+        result = index.query(args.start, args.end, args.device)
+        elapsed = time.perf_counter() - start
+        for row in zip(*(result[name] for name in RESULT_COLUMNS)):
+            when = datetime.datetime.fromtimestamp(row[0])
+            print(when, int(row[1]), *(round(float(value), 3) for value in row[2:]))
+        print(f"{len(result['epoch'])} samples from {index.blocks_read} blocks in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,157 @@
+"""
+Fake machine module so the firmware runs on CPython, see run.py.
+
+I2C talks to BMP390 register models, UART is the master end of a pty the
+host scripts can open like the real RS485 adapter.
+"""
+import os
+import struct
+import time
+import tty
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id, mode=None, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = int(bool(value))
+
+
+class Timer:
+    def __init__(self, id=0):
+        self.id = id
+
+    def init(self, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+
+class FakeBMP390:
+    """Register model of a BMP390, conversions take CONVERSION_MS like 32x oversampling does."""
+    CONVERSION_MS = 80
+    # T1, T2, T3, P1 .. P11, picked for ~22 C and ~1013 hPa
+    CALIBRATION = (27500, 19000, -7, 16385, 16384, 0, 0, 12666, 0, 0, 0, 0, 0, 0)
+    ADC_T = 8283300
+
+    def __init__(self, pressure_offset=0):
+        self.regs = bytearray(0x80)
+        self.regs[0x00] = 0x60
+        cal = list(self.CALIBRATION)
+        cal[7] += pressure_offset
+        self.regs[0x31:0x31 + 21] = struct.pack("<HHbhhbbHHbbhbb", *cal)
+        self.ready_at = None
+
+    def read(self, register, n):
+        if register == 0x03:
+            done = self.ready_at is not None and time.monotonic() >= self.ready_at
+            self.regs[0x03] = 0x60 if done else 0x10
+        elif register == 0x04:
+            # slow drift so the plots have something to show
+            phase = time.monotonic() % 60 / 60
+            adc_p = int(phase * 2**23)
+            adc_t = self.ADC_T + int(phase * 20000)
+            self.regs[0x04:0x07] = adc_p.to_bytes(3, "little")
+            self.regs[0x07:0x0A] = adc_t.to_bytes(3, "little")
+        return bytes(self.regs[register:register + n])
+
+    def write(self, register, data):
+        if register == 0x1B:
+            self.ready_at = time.monotonic() + self.CONVERSION_MS / 1000
+        self.regs[register:register + len(data)] = data
+
+
+class I2C:
+    devices = {
+        0x76: FakeBMP390(-2),
+        0x77: FakeBMP390(),
+        }
+
+    def __init__(self, id, scl=None, sda=None, freq=400000):
+        self.id = id
+
+    def _device(self, address):
+        if address not in self.devices:
+            raise OSError(19, "ENODEV")
+        return self.devices[address]
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def readfrom_mem(self, address, register, n):
+        return self._device(address).read(register, n)
+
+    def writeto_mem(self, address, register, data):
+        self._device(address).write(register, data)
+
+
+class UART:
+    """
+    Master end of a pty, the slave path is printed so a host script can open it.
+
+    Sending takes as long as it would on the wire, 10 bits a byte. Like the
+    driver, write() returns once what is left to send fits in txbuf, so a
+    long write blocks the caller, and txdone() tells when the line is idle.
+    """
+
+    def __init__(self, id, baudrate=115200, tx=None, rx=None, txbuf=256, **kwargs):
+        self.id = id
+        self.baudrate = baudrate
+        self.txbuf = txbuf
+        self.tx_idle_at = time.monotonic()
+        self.fd, slave = os.openpty()
+        tty.setraw(self.fd)
+        os.set_blocking(self.fd, False)
+        self.path = os.ttyname(slave)
+        self.rx = bytearray()
+        print(f"UART{id} at {baudrate} baud on {self.path}")
+
+    def init(self, baudrate=115200, **kwargs):
+        self.baudrate = baudrate
+
+    def any(self):
+        try:
+            self.rx.extend(os.read(self.fd, 4096))
+        except BlockingIOError:
+            pass
+        return len(self.rx)
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.rx))
+        buf[:n] = self.rx[:n]
+        del self.rx[:n]
+        return n
+
+    def _wire_time(self, n):
+        return n * 10 / self.baudrate
+
+    def write(self, data):
+        now = time.monotonic()
+        self.tx_idle_at = max(self.tx_idle_at, now) + self._wire_time(len(data))
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                time.sleep(0.001)
+        wait = self.tx_idle_at - self._wire_time(self.txbuf) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        return len(data)
+
+    def txdone(self):
+        return time.monotonic() >= self.tx_idle_at
+
+    def flush(self):
+        wait = self.tx_idle_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
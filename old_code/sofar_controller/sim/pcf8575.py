@@ -0,0 +1,30 @@
+"""Fake PCF8575 port expander for the simulator, no button is ever pressed."""
+
+
+class PCF8575:
+    IN = 1
+    OUT = 0
+    IRQ_FALLING = 2
+
+    def __init__(self, i2c, address=0x20):
+        self.address = address
+        self._port = 0
+
+    @property
+    def port(self):
+        return self._port
+
+    @port.setter
+    def port(self, value):
+        self._port = value & 0xFFFF
+
+    def pin(self, pin, value=None, mode=None):
+        if value is None:
+            return (self._port >> pin) & 1
+        if value:
+            self._port |= 1 << pin
+        else:
+            self._port &= ~(1 << pin)
+
+    def irq(self, pin, trigger=None, handler=None):
+        pass
@@ -0,0 +1,60 @@
+"""
+Runs the firmware on CPython with the fake machine, ssd1306 and pcf8575
+modules in this directory. The UART is a pty, its path is printed at boot.
+With --seconds the run stops after that long and reports the CPU time used,
+which is how the idle cost of a main.py is compared.
+python sim/run.py [main.py] [--seconds 10] [--workdir dir]
+"""
+import argparse
+import asyncio
+import builtins
+import gc
+import os
+import runpy
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# MicroPython builtins the firmware uses
+builtins.const = lambda x: x
+_t0 = time.monotonic()
+time.ticks_ms = lambda: int((time.monotonic() - _t0) * 1000)
+time.ticks_us = lambda: int((time.monotonic() - _t0) * 1000000)
+time.ticks_add = lambda a, b: a + b
+time.ticks_diff = lambda a, b: a - b
+time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+asyncio.sleep_ms = lambda ms: asyncio.sleep(ms / 1000)
+SIM_HEAP = 160000
+gc.mem_free = lambda: SIM_HEAP
+
+
+def report(seconds, start_wall, start_cpu):
+    time.sleep(seconds)
+    wall = time.monotonic() - start_wall
+    cpu = time.process_time() - start_cpu
+    sys.stderr.write(f"{wall:.1f} s wall, {cpu:.2f} s cpu ({100 * cpu / wall:.1f}% of one core)\n")
+    sys.stderr.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the sofar controller firmware against fake hardware")
+    parser.add_argument("main", nargs="?", default=os.path.join(ROOT, "main.py"))
+    parser.add_argument("--seconds", type=float, help="stop after this long and report the cpu time used")
+    parser.add_argument("--quiet", action="store_true", help="drop the firmware's console output")
+    parser.add_argument("--workdir", help="stands in for the flash filesystem, a fresh temporary directory by default")
+    args = parser.parse_args()
+
+    main = os.path.abspath(args.main)
+    sys.path[:0] = [HERE, os.path.join(ROOT, "libs"), os.path.dirname(main)]
+    # the flash log writes relative to the working directory
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="sofar_sim_"))
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+    if args.seconds:
+        threading.Thread(target=report, args=(args.seconds, time.monotonic(), time.process_time()), daemon=True).start()
+    runpy.run_path(main, run_name="__main__")
@@ -0,0 +1,31 @@
+"""Fake SSD1306 driver for the simulator, keeps the pixels in memory."""
+
+
+class SSD1306_I2C:
+    def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height)
+        self.frames = 0
+
+    def fill(self, c):
+        for i in range(len(self.pixels)):
+            self.pixels[i] = c
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        if c is None:
+            return self.pixels[y * self.width + x]
+        self.pixels[y * self.width + x] = c
+
+    def line(self, x0, y0, x1, y1, c):
+        steps = max(abs(x1 - x0), abs(y1 - y0), 1)
+        for i in range(steps + 1):
+            self.pixel(x0 + (x1 - x0) * i // steps, y0 + (y1 - y0) * i // steps, c)
+
+    def text(self, string, x, y, c=1):
+        pass
+
+    def show(self):
+        self.frames += 1
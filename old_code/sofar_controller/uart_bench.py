@@ -0,0 +1,96 @@
+"""
+Throughput benchmark for the RS485 line reader.
+
+Feeds a fake UART with ready-made frames and measures how many bytes per
+second the old byte-at-a-time reader and LineReader can consume, against
+what the link delivers at each baud rate. Runs on the device, or on a PC
+with libs/ on the path: PYTHONPATH=libs python uart_bench.py
+"""
+import time
+
+try:
+    const
+except NameError:
+    # running on CPython
+    import builtins
+    builtins.const = lambda x: x
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+from linereader import LineReader
+
+try:
+    _now_us = time.ticks_us
+    _diff_us = time.ticks_diff
+except AttributeError:
+    _now_us = lambda: int(time.perf_counter() * 1000000)
+    _diff_us = lambda a, b: a - b
+
+BAUD_RATES = (115200, 230400, 460800, 921600)
+FRAME = b"02:00:read\r\n"
+FRAMES = 2000
+
+
+class FakeUART:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def any(self):
+        return len(self.data) - self.pos
+
+    def read(self, n):
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += len(chunk)
+        return chunk
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.data) - self.pos)
+        buf[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def bench_legacy(data):
+    uart = FakeUART(data)
+    frames = 0
+    buffer = ""
+    start = _now_us()
+    while uart.any():
+        char = uart.read(1).decode("ascii")
+        buffer += char
+        if buffer.endswith("\n") or buffer.endswith("\r"):
+            if buffer.strip():
+                frames += 1
+            buffer = ""
+    return frames, _diff_us(_now_us(), start)
+
+
+def bench_linereader(data):
+    reader = LineReader(FakeUART(data))
+    frames = 0
+    start = _now_us()
+    while reader.uart.any() or reader.start != reader.end:
+        if reader.readline() is not None:
+            frames += 1
+    return frames, _diff_us(_now_us(), start)
+
+
+def main():
+    data = FRAME * FRAMES
+    results = []
+    for name, bench in (("legacy", bench_legacy), ("linereader", bench_linereader)):
+        frames, us = bench(data)
+        rate = len(data) * 1000000 / max(us, 1)
+        results.append((name, frames, rate))
+        print(f"{name:>10}: {frames} frames, {us / frames:.1f} us/frame, {rate / 1000:.1f} kB/s")
+
+    print()
+    for baud in BAUD_RATES:
+        # 8N1, 10 bits on the wire per byte
+        link = baud / 10
+        headroom = ", ".join(f"{name} {rate / link:.1f}x" for name, _, rate in results)
+        print(f"{baud:>7} baud ({link / 1000:.1f} kB/s): {headroom}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Checks that steady state UI frames allocate nothing.
+
+Renders the status screen with fixed values, the way frames between samples
+look, and measures the bytes allocated per frame: gc.mem_alloc on the device
+(copy libs/ and this file over and import it), tracemalloc on the host where
+the display and port expander come from sim/. Frames with fresh readings and
+a fresh command every time, so that every line is rebuilt, are held to a
+budget for the floats to_fixed boxes and the strings that are encoded. The
+old f-string render is measured the same way for comparison.
+
+Only the device run checks that nothing is allocated, gc.mem_alloc counts
+every allocation. tracemalloc only sees the peak of what is alive at once,
+which is the same with fresh values as without, so on the host the peak is
+just held to a bound. The host check that means something is the snapshot
+comparison: frames must not keep anything allocated in libs/ or sim/.
+python ui_alloc_check.py
+"""
+import gc
+import sys
+import time
+
+try:
+    gc.mem_alloc
+    DEVICE = True
+except AttributeError:
+    DEVICE = False
+    import os
+    import tracemalloc
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.join(here, "sim"), os.path.join(here, "libs")]
+    import run # installs the MicroPython shims
+
+from machine import I2C, Pin
+from interface import InterfaceBoard
+from statusscreen import StatusScreen
+
+FRAMES = 50
+# to_fixed boxes two floats per reading, 16 B each, and the sender, command
+# and args are encoded into bytes objects of 32 B
+FRESH_LIMIT = 4 * 2 * 16 + 3 * 32
+# a range object per loop and boxed ints and floats on CPython
+HOST_TRANSIENT_LIMIT = 224
+
+
+class Commands:
+    last_received = time.time()
+    last_from = "00"
+    last_command = "read"
+    last_args = ""
+
+
+def legacy_render(iface, t_inner, p_inner, t_outer, p_outer, commands, now_s):
+    iface.clear(0)
+    iface.sprint("Device Address: 02", 0,0,1)
+    iface.set_led(R=1)
+    iface.sprint("Solenoid Closed", 0,9,1)
+    iface.sprint(f"I: {t_inner:.1f}C {p_inner:.2f}hPa", 0, 18)
+    iface.sprint(f"O: {t_outer:.1f}C {p_outer:.2f}hPa", 0, 27)
+    iface.sprint(f"last msg from: {commands.last_from}", 0, 39)
+    iface.sprint(f"{commands.last_command} {commands.last_args}", 0, 47)
+    iface.sprint(f"{int(now_s - commands.last_received)} s ago", 0, 58)
+
+
+def snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(True, os.path.join(here, "libs", "*")),
+        tracemalloc.Filter(True, os.path.join(here, "sim", "*")),
+        ))
+
+
+def measure(frame):
+    """Return the most bytes any one of FRAMES calls to frame allocated."""
+    frame() # warm up, the first frame builds the lines
+    worst = 0
+    for _ in range(FRAMES):
+        if DEVICE:
+            gc.collect()
+            before = gc.mem_alloc()
+            frame()
+            used = gc.mem_alloc() - before
+        else:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            frame()
+            used = tracemalloc.get_traced_memory()[1] - before
+        worst = max(worst, used)
+    return worst
+
+
+def kept(frame):
+    """Return the bytes FRAMES calls to frame left allocated in libs/ and sim/, host only."""
+    frame()
+    start = snapshot()
+    for _ in range(FRAMES):
+        frame()
+    return sum(max(stat.size_diff, 0) for stat in snapshot().compare_to(start, "lineno"))
+
+
+def main():
+    iface = InterfaceBoard(I2C(0, scl=Pin(7), sda=Pin(6)))
+    screen = StatusScreen(iface, "02")
+    commands = Commands()
+    t_inner, p_inner, t_outer, p_outer = 22.31, 1013.25, 22.47, 1013.41
+    now_s = commands.last_received
+
+    def new_frame():
+        screen.update(False, t_inner, p_inner, t_outer, p_outer, commands, now_s)
+        screen.render()
+
+    # new objects every frame of measure() and kept(), made up front so making them is not measured
+    fresh = iter([(22.31 + i / 100, 1013.25 + i / 100, 22.47 + i / 100, 1013.41 + i / 100, "%02d" % (i % 100), "cmd%d" % i)
+                  for i in range(2 * (FRAMES + 1))])
+
+    def fresh_frame():
+        t_inner, p_inner, t_outer, p_outer, sender, command = next(fresh)
+        commands.last_from = sender
+        commands.last_command = command
+        rebuilt = screen.update(False, t_inner, p_inner, t_outer, p_outer, commands, now_s)
+        screen.render()
+        assert rebuilt, "fresh values did not rebuild the lines"
+
+    def old_frame():
+        legacy_render(iface, t_inner, p_inner, t_outer, p_outer, commands, now_s)
+
+    if not DEVICE:
+        tracemalloc.start()
+    new = measure(new_frame)
+    changed = measure(fresh_frame)
+    old = measure(old_frame)
+    limit = 0 if DEVICE else HOST_TRANSIENT_LIMIT
+    fresh_limit = FRESH_LIMIT if DEVICE else HOST_TRANSIENT_LIMIT
+    what = "allocated" if DEVICE else "peak"
+    print(f"bytes {what} per frame: status screen {new} (limit {limit}), "
+          f"with fresh values {changed} (limit {fresh_limit}), f-string render {old}")
+    assert new <= limit, f"status screen frame allocated {new} bytes"
+    assert changed <= fresh_limit, f"status screen frame with fresh values allocated {changed} bytes"
+    if not DEVICE:
+        new_kept = kept(new_frame)
+        changed_kept = kept(fresh_frame)
+        print(f"bytes kept over {FRAMES} frames: status screen {new_kept}, with fresh values {changed_kept}")
+        assert new_kept == 0 and changed_kept == 0, "status screen frames kept memory allocated"
+
+
+main()